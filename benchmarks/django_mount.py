@@ -0,0 +1,173 @@
+"""
+Throughput and latency of the Django admin changelist behind each mount
+mode of `shared.starlette.create_app`:
+
+    python benchmarks/django_mount.py [--requests N] [--concurrency C]
+
+`wsgi` is Starlette's buffering WSGIMiddleware, `streaming-wsgi` is
+`StreamingWSGIMiddleware` and `asgi` is Django's own ASGI handler (Django
+3.0+ only). Requests are driven in-process, so the numbers exclude the
+network and server but include every thread handoff.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+import django  # noqa: E402
+from django.conf import settings  # noqa: E402
+
+settings.configure(
+    DEBUG=False,
+    SECRET_KEY="benchmark",
+    ALLOWED_HOSTS=["*"],
+    ROOT_URLCONF=__name__,
+    INSTALLED_APPS=[
+        "django.contrib.admin",
+        "django.contrib.auth",
+        "django.contrib.contenttypes",
+        "django.contrib.sessions",
+        "django.contrib.messages",
+    ],
+    MIDDLEWARE=[
+        "django.contrib.sessions.middleware.SessionMiddleware",
+        "django.contrib.auth.middleware.AuthenticationMiddleware",
+        "django.contrib.messages.middleware.MessageMiddleware",
+    ],
+    TEMPLATES=[
+        {
+            "BACKEND": "django.template.backends.django.DjangoTemplates",
+            "APP_DIRS": True,
+            "OPTIONS": {
+                "context_processors": [
+                    "django.template.context_processors.request",
+                    "django.contrib.auth.context_processors.auth",
+                    "django.contrib.messages.context_processors.messages",
+                ]
+            },
+        }
+    ],
+    DATABASES={
+        "default": {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": os.path.join(tempfile.mkdtemp(), "benchmark.sqlite3"),
+        }
+    },
+)
+django.setup()
+
+from django.contrib import admin  # noqa: E402
+from django.urls import path  # noqa: E402
+
+urlpatterns = [path("admin/", admin.site.urls)]
+
+
+def prepare():
+    from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+    from django.contrib.auth.models import User
+    from django.contrib.sessions.backends.db import SessionStore
+    from django.core.management import call_command
+
+    call_command("migrate", verbosity=0)
+    admin_user = User.objects.create_superuser("admin", "admin@example.com", "admin")
+    User.objects.bulk_create(
+        [User(username="user%d" % i, email="user%d@example.com" % i) for i in range(200)]
+    )
+    session = SessionStore()
+    session[SESSION_KEY] = str(admin_user.pk)
+    session[BACKEND_SESSION_KEY] = "django.contrib.auth.backends.ModelBackend"
+    session[HASH_SESSION_KEY] = admin_user.get_session_auth_hash()
+    session.save()
+    return "sessionid=%s" % session.session_key
+
+
+async def call(app, cookie):
+    scope = {
+        "type": "http",
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "root_path": "",
+        "path": "/admin/auth/user/",
+        "query_string": b"",
+        "headers": [(b"host", b"testserver"), (b"cookie", cookie.encode())],
+        "server": ("testserver", 80),
+        "client": ("127.0.0.1", 40000),
+    }
+    status = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            status.append(message["status"])
+
+    start = time.perf_counter()
+    await app(scope, receive, send)
+    assert status == [200], status
+    return time.perf_counter() - start
+
+
+async def run(app, cookie, requests, concurrency):
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            latencies.append(await call(app, cookie))
+
+    start = time.perf_counter()
+    await asyncio.gather(*[one() for _ in range(requests)])
+    return time.perf_counter() - start, sorted(latencies)
+
+
+def main():
+    from django.core.wsgi import get_wsgi_application
+
+    from shared.starlette import create_app, get_django_asgi_application
+    from shared.wsgi import StreamingWSGIMiddleware
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--threads", type=int, default=10)
+    args = parser.parse_args()
+
+    cookie = prepare()
+    wsgi_app = get_wsgi_application()
+    modes = [
+        ("wsgi", create_app(wsgi_app, wsgi=True)),
+        ("streaming-wsgi", StreamingWSGIMiddleware(wsgi_app, workers=args.threads)),
+    ]
+    if get_django_asgi_application() is None:
+        print("Django %s has no ASGI handler; streaming-wsgi is what asgi=True serves"
+              % django.get_version())
+    else:
+        modes.append(("asgi", create_app(wsgi_app, asgi=True)))
+
+    loop = asyncio.get_event_loop()
+    for name, app in modes:
+        loop.run_until_complete(run(app, cookie, args.concurrency, args.concurrency))
+        elapsed, latencies = loop.run_until_complete(
+            run(app, cookie, args.requests, args.concurrency)
+        )
+        p99 = latencies[int(len(latencies) * 0.99) - 1]
+        print(
+            "%-16s %7.1f req/s  p50 %6.1f ms  p99 %6.1f ms"
+            % (
+                name,
+                args.requests / elapsed,
+                statistics.median(latencies) * 1000,
+                p99 * 1000,
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
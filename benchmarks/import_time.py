@@ -0,0 +1,106 @@
+"""
+Measure cold import time of `shared.starlette` and the `shared.contrib`
+views with `python -X importtime`, and fail when a module exceeds its budget.
+
+    DJANGO_SETTINGS_MODULE=settings python benchmarks/import_time.py [--repeat N] [--scale F]
+
+Each module is imported in a fresh interpreter. The contrib views need Django
+settings; `django.setup()` runs before the timed import, so its cost is not
+counted against the view module. Starlette itself (100+ ms on its own) is a
+hard dependency of `shared.starlette`, so it is imported first and only the
+module's own overhead is held to the budget. `--scale` multiplies every
+budget, for slow CI machines.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+
+# milliseconds, cumulative time of the module's own `-X importtime` line
+BUDGETS = {
+    "shared.starlette": 25,
+    "shared.contrib.auth.views": 60,
+    "shared.contrib.payment.views": 120,
+}
+
+NEEDS_DJANGO = ("shared.contrib.",)
+
+# imported before the timed module, so their cost is not counted against it
+PRELOAD = {
+    "shared.starlette": (
+        "starlette.applications",
+        "starlette.background",
+        "starlette.exceptions",
+        "starlette.requests",
+        "starlette.responses",
+    ),
+}
+
+
+def measure(module):
+    """Return the cumulative import time of `module` in milliseconds."""
+    code = "import %s" % module
+    if module in PRELOAD:
+        code = "import %s; %s" % (", ".join(PRELOAD[module]), code)
+    if module.startswith(NEEDS_DJANGO):
+        code = "import django; django.setup(); " + code
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(
+        filter(None, [ROOT, env.get("PYTHONPATH")])
+    )
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        env=env,
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+    )
+    if process.returncode != 0:
+        errors = [
+            line
+            for line in process.stderr.splitlines()
+            if not line.startswith("import time:")
+        ]
+        raise RuntimeError(errors[-1] if errors else "exit %d" % process.returncode)
+    for line in process.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if name.strip() == module:
+            return int(cumulative) / 1000.0
+    # already imported by django.setup()
+    return 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--scale", type=float, default=1.0)
+    parser.add_argument("modules", nargs="*", default=list(BUDGETS))
+    args = parser.parse_args()
+
+    over_budget = []
+    for module in args.modules:
+        if module.startswith(NEEDS_DJANGO) and "DJANGO_SETTINGS_MODULE" not in os.environ:
+            print(f"{module:<34} skipped (DJANGO_SETTINGS_MODULE is not set)")
+            continue
+        try:
+            timings = [measure(module) for _ in range(args.repeat)]
+        except RuntimeError as exc:
+            print(f"{module:<34} failed: {exc}")
+            over_budget.append(module)
+            continue
+        median = statistics.median(timings)
+        budget = BUDGETS.get(module, float("inf")) * args.scale
+        verdict = "ok" if median <= budget else "OVER BUDGET"
+        print(f"{module:<34}{median:>8.1f} ms (budget {budget:.0f} ms) {verdict}")
+        if median > budget:
+            over_budget.append(module)
+    if over_budget:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
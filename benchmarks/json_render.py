@@ -0,0 +1,95 @@
+"""
+Compare the stdlib and orjson serializers used by `shared.responses.JSONResponse`.
+
+    python benchmarks/json_render.py [--number N]
+"""
+import argparse
+import os
+import sys
+import timeit
+from decimal import Decimal
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+from shared import serializers  # noqa: E402
+
+
+def plan_payment_details(index):
+    # shape of PlanPayment.details
+    return {
+        "amount": Decimal("15000.00") + index,
+        "order": "A1B2C3D4E5F%d" % index,
+        "user_details": {
+            "first_name": "Adé",
+            "last_name": "Ọlámídé",
+            "email": "user%d@example.com" % index,
+            "country": "Nigeria",
+            "currency": "ngn",
+            "default_rate": Decimal("15000.00"),
+            "user_kind": "agent",
+            "plan_code": "PLN_%08d" % index,
+            "paystack_details": {
+                "customer": {"id": index, "customer_code": "CUS_%d" % index},
+                "authorization": {"last4": "4081", "bank": "TEST BANK"},
+                "plan": None,
+            },
+        },
+        "paid": bool(index % 2),
+        "currency": "ngn",
+    }
+
+
+def graphql_result(size):
+    return {
+        "data": {
+            "payments": [
+                {
+                    "order": "A1B2C3D4E5F%d" % i,
+                    "amount": Decimal("2500.50"),
+                    "madePayment": True,
+                    "plan": "premium",
+                    "user": {"id": i, "username": "user%d" % i, "email": None},
+                }
+                for i in range(size)
+            ]
+        }
+    }
+
+
+PAYLOADS = {
+    "plan_payment_details": plan_payment_details(1),
+    "plan_payment_list_500": [plan_payment_details(i) for i in range(500)],
+    "graphql_payments_2000": graphql_result(2000),
+}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--number", type=int, default=200)
+    args = parser.parse_args()
+
+    candidates = [("stdlib", serializers.JSONSerializer())]
+    if serializers.orjson is not None:
+        candidates.append(("orjson", serializers.OrjsonSerializer()))
+        candidates.append(
+            ("orjson (strict_nan=False)", serializers.OrjsonSerializer(strict_nan=False))
+        )
+    else:
+        print("orjson is not installed; only the stdlib serializer is measured")
+
+    for name, payload in PAYLOADS.items():
+        print(f"{name}:")
+        baseline = None
+        expected = candidates[0][1].dumps(payload)
+        for label, serializer in candidates:
+            assert serializer.dumps(payload) == expected, label
+            seconds = min(
+                timeit.repeat(lambda: serializer.dumps(payload), number=args.number, repeat=3)
+            )
+            per_call = seconds / args.number * 1e6
+            baseline = baseline or per_call
+            print(f"  {label:<28}{per_call:>10.1f} us/call {baseline / per_call:>6.1f}x")
+
+
+if __name__ == "__main__":
+    main()
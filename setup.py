@@ -32,6 +32,11 @@ setup(
         'whitenoise==3.3.1',
         # 'django-paystack @ git+https://github.com/gbozee/django-paystack@master'
     ],
+    extras_require={
+        "orjson": ["orjson>=3.0"],
+        "compression": ["brotli", "zstandard"],
+        "paystack": ["httpx>=0.18"],
+    },
     dependency_links=[],
     classifiers=[
         "Environment :: Web Environment",
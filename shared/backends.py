@@ -1,24 +1,144 @@
+import asyncio
+import hashlib
+import threading
+import time
+import weakref
+
 from starlette.authentication import (
     AuthenticationBackend, AuthenticationError, SimpleUser, AuthCredentials)
 
+from .cache import TTLCache
+from .executors import Limiter
+from .metrics import timed
+from .utils import unverified_jwt_claims
+
 
 class ValidationError(Exception):
     pass
 
 
+_token_caches = weakref.WeakSet()
+
+
+def revoke_user_tokens(user_id):
+    """Drop every cached token belonging to `user_id` from all token caches."""
+    for cache in list(_token_caches):
+        cache.revoke_user(user_id)
+
+
+class TokenCache(object):
+    """
+    Bounded TTL+LRU cache of verified tokens, keyed by a digest of the token.
+
+    An entry never outlives the `exp` claim of its token. Entries are only
+    dropped early by `revoke_user_tokens`, which the contrib user model calls
+    from `save()` after a password change or deactivation. Anything that
+    skips `save()` -- `QuerySet.update(is_active=False)`, raw SQL, another
+    process -- leaves the user authenticated until `ttl` runs out, so keep it
+    short, or call `revoke_user_tokens` yourself after bulk updates.
+    """
+
+    def __init__(self, maxsize=4096, ttl=60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._by_user = {}
+        self._lock = threading.Lock()
+        _token_caches.add(self)
+
+    @staticmethod
+    def digest(token):
+        return hashlib.sha256(token.encode("utf-8")).digest()
+
+    def get(self, token):
+        entry = self._entries.get(self.digest(token))
+        if entry is None:
+            return None
+        return entry[1]
+
+    def set(self, token, result):
+        claims = unverified_jwt_claims(token)
+        ttl = self.ttl
+        if "exp" in claims:
+            try:
+                remaining = float(claims["exp"]) - time.time()
+            except (TypeError, ValueError):
+                return
+            if remaining <= 0:
+                return
+            ttl = remaining if ttl is None else min(ttl, remaining)
+        user_id = claims.get("user_id")
+        key = self.digest(token)
+        self._entries.set(key, (user_id, result), ttl=ttl)
+        if user_id is not None:
+            with self._lock:
+                self._by_user.setdefault(user_id, set()).add(key)
+                if len(self._by_user) > 2 * self.maxsize:
+                    self._prune()
+
+    def _prune(self):
+        # entries evicted by the LRU leave stale keys behind in the index
+        for user_id, keys in list(self._by_user.items()):
+            keys = {key for key in keys if key in self._entries}
+            if keys:
+                self._by_user[user_id] = keys
+            else:
+                del self._by_user[user_id]
+
+    def revoke_user(self, user_id):
+        with self._lock:
+            keys = self._by_user.pop(user_id, ())
+        for key in keys:
+            self._entries.pop(key)
+
+    def clear(self):
+        with self._lock:
+            self._by_user.clear()
+        self._entries.clear()
+
+
+def is_async_callable(func):
+    return asyncio.iscoroutinefunction(func) or asyncio.iscoroutinefunction(
+        getattr(func, "__call__", None))
+
+
 class GraphqlBackend(AuthenticationBackend):
-    def __init__(self, validateToken):
+    """
+    `validateToken` may be a plain function or an `async def`. Plain
+    functions usually hit the database, so they are run in a worker thread
+    through `DatabaseSyncToAsync`, with at most `concurrency` validations in
+    flight at once. `limiter.stats` exposes the queue depth and wait time.
+    """
+
+    def __init__(self, validateToken, cache=None, concurrency=None):
         self.validateToken = validateToken
+        self.cache = cache
+        self.limiter = Limiter(concurrency)
+        if is_async_callable(validateToken):
+            self._validate = validateToken
+        else:
+            from .starlette import database_sync_to_async
+
+            self._validate = database_sync_to_async(validateToken)
 
     async def authenticate(self, request):
         if "Authorization" not in request.headers:
             return
+        with timed("auth"):
+            return await self._authenticate(request)
+
+    async def _authenticate(self, request):
         auth = request.headers["Authorization"]
         token = auth.replace("Bearer", "").replace("Token", "").strip()
-        try:
-            result = self.validateToken(token)
-        except (ValueError, UnicodeDecodeError, ValidationError) as exc:
-            raise AuthenticationError('Invalid token credentials')
+        result = self.cache.get(token) if self.cache is not None else None
+        if result is None:
+            try:
+                async with self.limiter:
+                    result = await self._validate(token)
+            except (ValueError, UnicodeDecodeError, ValidationError) as exc:
+                raise AuthenticationError('Invalid token credentials')
+            if self.cache is not None:
+                self.cache.set(token, result)
 
         # TODO: You'd want to verify the username and password here,
         #       possibly by installing `DatabaseMiddleware`
@@ -0,0 +1,60 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class TTLCache(object):
+    """
+    A bounded, thread-safe LRU mapping whose entries expire after a deadline.
+
+    Entries are evicted least-recently-used first once `maxsize` is reached,
+    and lazily dropped on access once their deadline has passed.
+    """
+
+    def __init__(self, maxsize=1024, ttl=None, timer=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.timer = timer
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        entry = self._data.get(key)
+        if entry is None:
+            return False
+        return entry[1] is None or entry[1] > self.timer()
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                value, deadline = self._data[key]
+            except KeyError:
+                return default
+            if deadline is not None and deadline <= self.timer():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        deadline = None if ttl is None else self.timer() + ttl
+        with self._lock:
+            self._data[key] = (value, deadline)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key, default=None):
+        with self._lock:
+            entry = self._data.pop(key, None)
+        if entry is None:
+            return default
+        return entry[0]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
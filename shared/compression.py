@@ -0,0 +1,135 @@
+import gzip
+
+from .executors import run_in_pool
+from .utils import negotiate_encoding
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# already compressed, or not worth compressing
+SKIP_CONTENT_TYPES = (
+    b"image/png",
+    b"image/jpeg",
+    b"image/gif",
+    b"image/webp",
+    b"video/",
+    b"audio/",
+    b"application/zip",
+    b"application/gzip",
+    b"application/x-gzip",
+    b"application/octet-stream",
+    b"font/woff",
+)
+
+
+class CompressionMiddleware(object):
+    """
+    Compresses responses with the first of `encodings` the client accepts;
+    brotli and zstd are only offered when their packages are installed.
+
+    Bodies smaller than `minimum_size`, streaming responses, responses that
+    already carry a `Content-Encoding` and media that is already compressed
+    are passed through untouched. Bodies of `offload_size` bytes or more
+    are compressed on the "cpu" executor pool.
+    """
+
+    def __init__(
+        self,
+        app,
+        minimum_size=500,
+        gzip_level=6,
+        brotli_quality=4,
+        zstd_level=3,
+        offload_size=64 * 1024,
+        encodings=("br", "zstd", "gzip"),
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.offload_size = offload_size
+        self.compressors = {"gzip": lambda body: gzip.compress(body, gzip_level)}
+        if brotli is not None:
+            self.compressors["br"] = lambda body: brotli.compress(
+                body, quality=brotli_quality
+            )
+        if zstandard is not None:
+            compressor = zstandard.ZstdCompressor(level=zstd_level)
+            self.compressors["zstd"] = lambda body: compressor.compress(body)
+        self.encodings = tuple(e for e in encodings if e in self.compressors)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        accept_encoding = ""
+        for name, value in scope["headers"]:
+            if name == b"accept-encoding":
+                accept_encoding = value.decode("latin1")
+                break
+        encoding = negotiate_encoding(accept_encoding, self.encodings)
+        if encoding == "identity":
+            await self.app(scope, receive, send)
+            return
+
+        held = []
+
+        async def send_compressed(message):
+            if message["type"] == "http.response.start":
+                held.append(message)
+                return
+            if message["type"] != "http.response.body" or not held:
+                await send(message)
+                return
+            start = held.pop()
+            body = message.get("body", b"")
+            if message.get("more_body", False) or not self.should_compress(
+                start.get("headers", ()), body
+            ):
+                await send(start)
+                await send(message)
+                return
+            if len(body) >= self.offload_size:
+                body = await run_in_pool("cpu", self.compressors[encoding], body)
+            else:
+                body = self.compressors[encoding](body)
+            start["headers"] = self.compressed_headers(start.get("headers", ()), encoding, body)
+            await send(start)
+            await send({"type": "http.response.body", "body": body})
+
+        await self.app(scope, receive, send_compressed)
+
+    def should_compress(self, headers, body):
+        if len(body) < self.minimum_size:
+            return False
+        for name, value in headers:
+            if name == b"content-encoding":
+                return False
+            if name == b"content-type" and value.lower().startswith(SKIP_CONTENT_TYPES):
+                return False
+        return True
+
+    @staticmethod
+    def compressed_headers(headers, encoding, body):
+        result = []
+        vary = None
+        for name, value in headers:
+            if name == b"content-length":
+                continue
+            if name == b"vary":
+                vary = value
+                continue
+            result.append((name, value))
+        if vary is None:
+            vary = b"Accept-Encoding"
+        elif b"accept-encoding" not in vary.lower():
+            vary += b", Accept-Encoding"
+        result.append((b"vary", vary))
+        result.append((b"content-encoding", encoding.encode("latin1")))
+        result.append((b"content-length", str(len(body)).encode("latin1")))
+        return result
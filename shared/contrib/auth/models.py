@@ -12,12 +12,17 @@ from django.contrib.auth.models import (
 from django.contrib.auth.models import _
 from django.db import models
 from rest_framework_jwt import utils
-from shared.backends import ValidationError
+from shared.backends import ValidationError, revoke_user_tokens
+from shared.cache import TTLCache
+from shared.utils import unverified_jwt_claims
 
 PersonalInfoType = Union[str, Dict[str, str]]
 
 
-def jwt_get_secret_key(payload=None, model=None):
+_secret_keys = TTLCache(maxsize=4096)
+
+
+def jwt_get_secret_key(payload=None, model=None, user=None):
     """
     For enhanced security you may want to use a secret key based on user.
 
@@ -27,21 +32,51 @@ def jwt_get_secret_key(payload=None, model=None):
         - etc.
     """
     if utils.api_settings.JWT_GET_USER_SECRET_KEY:
-        User = model  # noqa: N806
-        user = User.objects.get(pk=payload.get('user_id'))
-        key = str(utils.api_settings.JWT_GET_USER_SECRET_KEY(user))
-        return key
+        if user is None:
+            User = model  # noqa: N806
+            user = User.objects.get(pk=payload.get('user_id'))
+        return get_user_secret_key(user)
     return utils.api_settings.JWT_SECRET_KEY
 
 
-def jwt_decode_handler(token, model=None):
+def get_user_secret_key(user):
+    # keyed on the password hash so a password change invalidates the entry
+    cache_key = (user.__class__, user.pk, user.password)
+    key = _secret_keys.get(cache_key)
+    if key is None:
+        key = str(utils.api_settings.JWT_GET_USER_SECRET_KEY(user))
+        _secret_keys.set(cache_key, key)
+    return key
+
+
+def jwt_decode_user(token, model=None, get_user=None):
+    """
+    Verify `token` and return `(payload, user)`.
+
+    When secret keys are derived per user, the user is loaded once by the
+    `user_id` claim and returned so callers can reuse it instead of querying
+    again; otherwise `user` is None. `get_user` replaces that query, e.g.
+    with a lookup into users that were prefetched in bulk.
+    """
     options = {
         'verify_exp': utils.api_settings.JWT_VERIFY_EXPIRATION,
     }
-    # get user from token, BEFORE verification, to get user secret key
-    unverified_payload = utils.jwt.decode(token, None, False)
-    secret_key = jwt_get_secret_key(unverified_payload, model)
-    return utils.jwt.decode(
+    user = None
+    secret_key = utils.api_settings.JWT_SECRET_KEY
+    if utils.api_settings.JWT_GET_USER_SECRET_KEY:
+        # get user from token, BEFORE verification, to get user secret key
+        unverified_payload = unverified_jwt_claims(token)
+        if not unverified_payload:
+            raise jwt.DecodeError('Invalid token payload')
+        user_id = unverified_payload.get('user_id')
+        if get_user is not None:
+            user = get_user(user_id)
+        else:
+            user = model.objects.filter(pk=user_id).first()
+        if user is None:
+            raise model.DoesNotExist()
+        secret_key = get_user_secret_key(user)
+    payload = utils.jwt.decode(
         token,
         utils.api_settings.JWT_PUBLIC_KEY or secret_key,
         utils.api_settings.JWT_VERIFY,
@@ -50,11 +85,16 @@ def jwt_decode_handler(token, model=None):
         audience=utils.api_settings.JWT_AUDIENCE,
         issuer=utils.api_settings.JWT_ISSUER,
         algorithms=[utils.api_settings.JWT_ALGORITHM])
+    return payload, user
+
+
+def jwt_decode_handler(token, model=None):
+    return jwt_decode_user(token, model)[0]
 
 
-def jwt_encode_handler(payload, model):
+def jwt_encode_handler(payload, model, user=None):
     key = utils.api_settings.JWT_PRIVATE_KEY or jwt_get_secret_key(
-        payload, model)
+        payload, model, user=user)
     return utils.jwt.encode(payload, key,
                             utils.api_settings.JWT_ALGORITHM).decode('utf-8')
 
@@ -77,19 +117,76 @@ class VerificationSerializer(object):
         self.model = model
 
     def _check_payload(self, token):
+        return self._check_token(token)[0]
+
+    def _check_token(self, token, get_user=None):
         # Check payload valid (based off of JSONWebTokenAuthentication,
         # may want to refactor)
         try:
-            payload = jwt_decode_handler(token, self.model)
+            return jwt_decode_user(token, self.model, get_user=get_user)
         except jwt.ExpiredSignature:
             msg = _('Signature has expired.')
             raise ValidationError(msg)
         except jwt.DecodeError:
             msg = _('Error decoding signature.')
             raise ValidationError(msg)
-        return payload
+        except jwt.InvalidTokenError:
+            msg = _('Invalid token.')
+            raise ValidationError(msg)
+        except self.model.DoesNotExist:
+            msg = _("User doesn't exist.")
+            raise ValidationError(msg)
 
-    def _check_user(self, payload):
+    def _check_tokens(self, tokens):
+        from django.core.exceptions import ValidationError as FieldError
+        from rest_framework_jwt.serializers import (jwt_get_username_from_payload,)
+        if utils.api_settings.JWT_GET_USER_SECRET_KEY:
+            field = self.model._meta.pk
+            get_key = lambda claims: claims.get('user_id')
+        else:
+            field = self.model._meta.get_field(self.model.USERNAME_FIELD)
+            get_key = jwt_get_username_from_payload
+
+        # the claims are not verified yet: a malformed user id or username
+        # fails its own token instead of the bulk query
+        keys, errors = {}, {}
+        for token in tokens:
+            key = get_key(unverified_jwt_claims(token))
+            if key is None:
+                continue
+            try:
+                keys[token] = field.to_python(key)
+            except (FieldError, TypeError, ValueError):
+                errors[token] = _('Invalid payload.')
+
+        if utils.api_settings.JWT_GET_USER_SECRET_KEY:
+            users = self.model.objects.in_bulk(set(keys.values()))
+            get_user = lambda user_id: users.get(field.to_python(user_id))
+        else:
+            users = {
+                user.get_username(): user
+                for user in self.model.objects.filter(**{
+                    '%s__in' % self.model.USERNAME_FIELD: set(keys.values())})
+            }
+            get_user = None
+
+        results = []
+        for token in tokens:
+            if token in errors:
+                results.append({'token': token, 'error': str(errors[token])})
+                continue
+            try:
+                payload, user = self._check_token(token, get_user=get_user)
+                if user is None:
+                    user = users.get(keys.get(token))
+                user = self._check_user(payload=payload, user=user)
+            except ValidationError as exc:
+                results.append({'token': token, 'error': str(exc)})
+            else:
+                results.append({'token': token, 'user': user})
+        return results
+
+    def _check_user(self, payload, user=None):
         from rest_framework_jwt.serializers import (jwt_get_username_from_payload,)
         username = jwt_get_username_from_payload(payload)
 
@@ -97,12 +194,18 @@ class VerificationSerializer(object):
             msg = _('Invalid payload.')
             raise ValidationError(msg)
 
-        # Make sure user exists
-        try:
-            user = self.model.objects.get_by_natural_key(username)
-        except self.model.DoesNotExist:
-            msg = _("User doesn't exist.")
-            raise ValidationError(msg)
+        if user is not None:
+            # already loaded while deriving the secret key
+            if user.get_username() != username:
+                msg = _('Invalid payload.')
+                raise ValidationError(msg)
+        else:
+            # Make sure user exists
+            try:
+                user = self.model.objects.get_by_natural_key(username)
+            except self.model.DoesNotExist:
+                msg = _("User doesn't exist.")
+                raise ValidationError(msg)
 
         if not user.is_active:
             msg = _('User account is disabled.')
@@ -165,6 +268,17 @@ class AbstractUser(AbstractBaseUser):
         verbose_name_plural = _('users')
         abstract = True
 
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        # cached tokens must not outlive a password change or deactivation
+        if getattr(self, '_revoke_tokens', False) or not self.is_active:
+            self._revoke_tokens = False
+            revoke_user_tokens(self.pk)
+
+    def set_password(self, raw_password):
+        super().set_password(raw_password)
+        self._revoke_tokens = True
+
     def clean(self):
         super().clean()
         self.email = self.__class__.objects.normalize_email(self.email)
@@ -190,7 +304,7 @@ class AbstractUser(AbstractBaseUser):
 
     def get_new_token(self) -> str:
         payload = utils.jwt_payload_handler(self)
-        return jwt_encode_handler(payload, self.__class__)
+        return jwt_encode_handler(payload, self.__class__, user=self)
 
     @classmethod
     def verify_token(cls, token: str, email: str) -> bool:
@@ -207,8 +321,24 @@ class AbstractUser(AbstractBaseUser):
     @classmethod
     def validate_token(cls,token):
         validator = VerificationSerializer(cls)
-        payload = validator._check_payload(token=token)
-        user = validator._check_user(payload=payload)
+        payload, user = validator._check_token(token=token)
+        user = validator._check_user(payload=payload, user=user)
         return {'token': token, 'user': user}
 
+    @classmethod
+    def validate_tokens(cls, tokens):
+        """
+        Validate many tokens with a single user query.
+
+        Returns one dict per token, in order: `{'token', 'user'}` when the
+        token is valid, `{'token', 'error'}` otherwise.
+        """
+        validator = VerificationSerializer(cls)
+        return validator._check_tokens(list(tokens))
+
+    @classmethod
+    async def validate_tokens_async(cls, tokens):
+        from shared.starlette import database_sync_to_async
+        return await database_sync_to_async(cls.validate_tokens)(tokens)
+
 
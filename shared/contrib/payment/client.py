@@ -0,0 +1,184 @@
+import asyncio
+import functools
+import importlib.util
+import random
+from urllib.parse import quote
+
+DEFAULT_BASE_URL = "https://api.paystack.co"
+
+
+class PaystackError(Exception):
+    pass
+
+
+class AsyncPaystackClient(object):
+    """
+    Async client for the Paystack endpoints used when verifying payments.
+
+    A client keeps one keep-alive connection pool, so share it (see
+    `get_client`) rather than creating one per call. Requests time out after
+    `timeout` seconds and are retried up to `retries` times on network
+    errors, 429 and 5xx answers, sleeping a random ("full jitter") share of
+    an exponential backoff in between. Point `base_url` (or the
+    `PAYSTACK_API_URL` setting) at a stub server, or pass an httpx
+    `transport`, to test without Paystack.
+    """
+
+    def __init__(
+        self,
+        secret_key=None,
+        base_url=None,
+        timeout=10.0,
+        connect_timeout=3.0,
+        retries=2,
+        backoff=0.25,
+        max_connections=20,
+        transport=None,
+    ):
+        if not httpx_available():
+            raise ImportError(
+                "AsyncPaystackClient needs httpx: "
+                "pip install micro-shared-resources[paystack]"
+            )
+        import httpx
+
+        if secret_key is None or base_url is None:
+            from django.conf import settings
+
+            secret_key = secret_key or settings.PAYSTACK_SECRET_KEY
+            base_url = base_url or getattr(
+                settings, "PAYSTACK_API_URL", DEFAULT_BASE_URL
+            )
+        self.retries = retries
+        self.backoff = backoff
+        self.client = httpx.AsyncClient(
+            base_url=base_url,
+            headers={
+                "Authorization": "Bearer %s" % secret_key,
+                "Content-Type": "application/json",
+            },
+            timeout=httpx.Timeout(timeout, connect=connect_timeout),
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+            ),
+            transport=transport,
+        )
+
+    async def request(self, method, path, **kwargs):
+        """Return the decoded JSON body, retrying transient failures."""
+        import httpx
+
+        attempt = 0
+        while True:
+            try:
+                response = await self.client.request(method, path, **kwargs)
+            except httpx.TransportError as exc:
+                error = PaystackError("%s %s failed: %s" % (method, path, exc))
+            else:
+                if response.status_code != 429 and response.status_code < 500:
+                    try:
+                        return response.status_code, response.json()
+                    except ValueError:
+                        raise PaystackError(
+                            "%s %s answered %d with a non-JSON body"
+                            % (method, path, response.status_code)
+                        )
+                error = PaystackError(
+                    "%s %s answered %d" % (method, path, response.status_code)
+                )
+            if attempt >= self.retries:
+                raise error
+            await asyncio.sleep(random.uniform(0, self.backoff * 2 ** attempt))
+            attempt += 1
+
+    async def get(self, path, **kwargs):
+        status, body = await self.request("GET", path, **kwargs)
+        if status != 200 or not body.get("status"):
+            return None
+        return body["data"]
+
+    async def get_customer(self, customer):
+        return await self.get("/customer/%s" % _segment(customer))
+
+    async def get_plan(self, plan):
+        return await self.get("/plan/%s" % _segment(plan))
+
+    async def get_subscriptions(self, **params):
+        """List subscriptions, filtered by e.g. `plan=` and `customer=` ids."""
+        return await self.get("/subscription", params=params)
+
+    async def verify_payment(self, ref, amount=None, amount_only=True):
+        """
+        Verify the transaction `ref` (and its `amount`, in kobo). Returns
+        `(True, message)` or `(False, message)`; with `amount_only=False` a
+        successful result also carries the customer, authorization and plan
+        details, the customer and plan being fetched concurrently.
+        """
+        status, body = await self.request(
+            "GET", "/transaction/verify/%s" % _segment(ref)
+        )
+        data = body.get("data") or {}
+        if status != 200 or not body.get("status") or data.get("status") != "success":
+            return False, body.get("message") or "Could not verify transaction"
+        if amount is not None and int(data.get("amount", -1)) != int(amount):
+            return False, "Amount paid does not match"
+        if amount_only:
+            return True, body.get("message")
+        return True, body.get("message"), await self.payment_details(data)
+
+    async def payment_details(self, data):
+        customer = data.get("customer") or {}
+        plan = data.get("plan")
+        if isinstance(plan, dict):
+            plan = plan.get("plan_code")
+        customer_code = customer.get("customer_code") or customer.get("id")
+        full_customer, plan_details = await asyncio.gather(
+            self.get_customer(customer_code) if customer_code else _none(),
+            self.get_plan(plan) if plan else _none(),
+        )
+        return {
+            "customer": full_customer or customer,
+            "authorization": data.get("authorization"),
+            "plan": plan,
+            "plan_details": plan_details,
+        }
+
+    async def aclose(self):
+        await self.client.aclose()
+
+
+@functools.lru_cache(maxsize=None)
+def httpx_available():
+    # httpx is an optional extra, imported by the first client
+    return importlib.util.find_spec("httpx") is not None
+
+
+def _segment(value):
+    # references come from query strings: keep "/", "?" and ".." inside one segment
+    segment = quote(str(value), safe="")
+    if segment in (".", ".."):
+        segment = segment.replace(".", "%2E")
+    return segment
+
+
+async def _none():
+    return None
+
+
+_client = None
+
+
+def get_client():
+    """The process-wide client, created on first use."""
+    global _client
+    if _client is None:
+        _client = AsyncPaystackClient()
+    return _client
+
+
+async def close_client():
+    global _client
+    if _client is not None:
+        client, _client = _client, None
+        await client.aclose()
@@ -6,11 +6,14 @@ from django import forms
 from django.conf import settings
 from django.shortcuts import reverse
 
-from asgiref.sync import sync_to_async
+from shared.executors import in_pool
 from paystack import signals as p_signals
 from paystack.utils import PaystackAPI
 from paystack.utils import get_js_script as p_get_js_scripts
 
+from . import client as paystack_client
+from .pricing import PricingTable
+
 
 
 class PaymentForm(forms.Form):
@@ -21,41 +24,27 @@ class PaymentForm(forms.Form):
 
     def __init__(self, *args, **kwargs):
         data = args[0]
-        self.pricing = kwargs.pop("pricing_details")
+        # a pricing config dict or a prebuilt `PricingTable`
+        self.pricing_table = PricingTable.for_config(kwargs.pop("pricing_details"))
+        self.pricing = self.pricing_table.config
         super().__init__(*args, **kwargs)
 
     def clean_plan(self):
-        plans = self.pricing["plans"].keys()
         plan = self.cleaned_data.get("plan")
-        if plan not in plans:
+        if plan not in self.pricing_table.plans:
             raise forms.ValidationError("Plan passed not supported")
         return plan
 
     def get_payment_plans(self, plan):
-        plans = self.pricing["plans"][plan]
-        discount = self.pricing["discount"]
-        annual_plans = {}
-        if "semi_annual" in plans.keys():
-            for key, value in plans["semi_annual"].items():
-                annual_plans[key] = value * 2 * (1 - (discount / 100))
-            plans["annual"] = annual_plans
-            plans["annually"] = annual_plans
-        if "monthly" in plans.keys():
-            for key, value in plans["monthly"].items():
-                annual_plans[key] = value * 12 * (1 - (discount / 100))
-            plans["annual"] = annual_plans
-            plans["annually"] = annual_plans
-        return plans
+        return self.pricing_table.plans[plan]
 
     def get_plan_codes(self, plan):
-        plan_codes = self.pricing["plan_code"][plan]
         duration = self.cleaned_data.get("duration")
-        return plan_codes[duration]
+        return self.pricing_table.plan_code(plan, duration)
 
     def clean_duration(self):
-        payment_plans = self.get_payment_plans(self.cleaned_data.get("plan"))
         duration = self.cleaned_data.get("duration")
-        durations = payment_plans.keys()
+        durations = self.pricing_table.durations(self.cleaned_data.get("plan"))
         if duration not in durations:
             raise forms.ValidationError("Duration passed not supported")
         return duration
@@ -77,10 +66,10 @@ class PaymentForm(forms.Form):
         return self.template.determine_new_price(self.level_value, country)
 
     def determine_plan_amount(self, instance, country, currency=None):
-        plans = self.get_payment_plans(instance.plan)
-        considered_plans = plans[instance.duration]
         c_currency = currency or instance.get_currency_for_country(country)["currency"]
-        return considered_plans[c_currency.lower()]
+        return self.pricing_table.price(
+            instance.plan, instance.duration, c_currency.lower()
+        )
 
     def create_payment_instance(self, currency="ngn"):
         data = user_details or {}
@@ -202,10 +191,23 @@ def process_paystack_payment(request, order, kind="paystack", data=None):
         request=request,
         data=data,
     )
-    return plan
+    return order
+
+async def paystack_verification(request, amount_only=True, client=None, **kwargs):
+    """
+    Verify a payment through the shared `AsyncPaystackClient`, or through
+    the blocking `PaystackAPI` on the "http" pool when httpx is missing.
+    """
+    if client is None and not paystack_client.httpx_available():
+        return await blocking_paystack_verification(request, amount_only=amount_only)
+    client = client or paystack_client.get_client()
+    return await client.verify_payment(
+        request.get("trxref"), amount=int(request.get("amount")), amount_only=amount_only
+    )
+
 
-@sync_to_async
-def paystack_verification(request, amount_only=True, **kwargs):
+@in_pool("http")
+def blocking_paystack_verification(request, amount_only=True, **kwargs):
     amount = request.get("amount")
     txrf = request.get("trxref")
     paystack_instance = PaystackAPI()
@@ -1,9 +1,9 @@
 import os
 from decimal import Decimal
-from typing import NamedTuple
+from typing import Dict, NamedTuple
 
 # from django.contrib.postgres.fields import JSONField
-from django.db import models
+from django.db import models, transaction
 from django.utils.crypto import get_random_string
 
 from .fields import TimeStampedModel
@@ -54,6 +54,24 @@ class PaymentMixin(TimeStampedModel):
 
 
     def on_payment_verification(self, amount, paystack_data, **kwargs):
+        """
+        Mark the payment as made. The row is claimed with a conditional
+        update first, so when a verification is delivered several times only
+        the first one writes; the others reload the row and return it.
+        """
+        with transaction.atomic():
+            claimed = (
+                type(self)
+                ._default_manager.filter(pk=self.pk, made_payment=False)
+                .update(made_payment=True)
+            )
+            if not claimed:
+                self.refresh_from_db()
+                return self
+            self._apply_payment_verification(amount, paystack_data, **kwargs)
+        return self
+
+    def _apply_payment_verification(self, amount, paystack_data, **kwargs):
         self.made_payment = True
         self.amount = Decimal(amount)
         extra_data = self.extra_data
@@ -62,7 +80,6 @@ class PaymentMixin(TimeStampedModel):
             extra_data['kind'] = kwargs['kind']
         self.extra_data = extra_data
         self.save()
-        return self
 
 class PlanPayment(PaymentMixin):
     plan = models.CharField(max_length=100, null=True, blank=True)
@@ -0,0 +1,106 @@
+import hashlib
+import json
+from decimal import ROUND_HALF_UP, Decimal
+from types import MappingProxyType
+
+from shared.cache import TTLCache
+
+CENTS = Decimal("0.01")
+
+# derived duration -> (source duration, months it covers); later sources win
+ANNUAL_SOURCES = (("semi_annual", 2), ("monthly", 12))
+
+
+def to_decimal(value):
+    if isinstance(value, float):
+        # go through str so 0.1 stays 0.1
+        return Decimal(str(value))
+    return Decimal(value)
+
+
+def _freeze(value):
+    if isinstance(value, dict):
+        return MappingProxyType({key: _freeze(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+def config_fingerprint(config):
+    encoded = json.dumps(config, sort_keys=True, default=str).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()
+
+
+class PricingTable(object):
+    """
+    Every plan x duration x currency price of a pricing config, computed
+    once with `Decimal` arithmetic and rounded to cents.
+
+    The config has the shape `{"plans": {plan: {duration: {currency:
+    price}}}, "discount": percent, "plan_code": {plan: {duration: {currency:
+    code}}}}`. "annual" (also "annually") prices are derived from
+    "semi_annual" or "monthly" less the discount. Tables are read-only and
+    safe to share between threads; `for_config` returns the cached table for
+    a config and builds a new one when the config changes.
+    """
+
+    __slots__ = ("config", "discount", "plans", "plan_codes", "fingerprint")
+
+    def __init__(self, config, fingerprint=None):
+        discount = to_decimal(config.get("discount") or 0)
+        factor = 1 - discount / 100
+        plans = {}
+        for plan, durations in config["plans"].items():
+            table = {
+                duration: {
+                    currency: to_decimal(price).quantize(CENTS, ROUND_HALF_UP)
+                    for currency, price in prices.items()
+                }
+                for duration, prices in durations.items()
+            }
+            annual = {}
+            for duration, months in ANNUAL_SOURCES:
+                for currency, price in durations.get(duration, {}).items():
+                    annual[currency] = (to_decimal(price) * months * factor).quantize(
+                        CENTS, ROUND_HALF_UP
+                    )
+            if annual:
+                table["annual"] = table["annually"] = annual
+            plans[plan] = table
+        set_ = super().__setattr__
+        set_("config", _freeze(config))
+        set_("discount", discount)
+        set_("plans", _freeze(plans))
+        set_("plan_codes", _freeze(config.get("plan_code") or {}))
+        set_("fingerprint", fingerprint or config_fingerprint(config))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("PricingTable is read-only")
+
+    def __repr__(self):
+        return "<PricingTable %s plans=%d>" % (self.fingerprint[:12], len(self.plans))
+
+    @classmethod
+    def for_config(cls, config):
+        if isinstance(config, cls):
+            return config
+        fingerprint = config_fingerprint(config)
+        table = _tables.get(fingerprint)
+        if table is None:
+            table = cls(config, fingerprint=fingerprint)
+            _tables.set(fingerprint, table)
+        return table
+
+    def durations(self, plan):
+        return self.plans.get(plan, MappingProxyType({})).keys()
+
+    def price(self, plan, duration, currency):
+        """Raises `KeyError` for an unknown plan, duration or currency."""
+        return self.plans[plan][duration][currency]
+
+    def plan_code(self, plan, duration, currency=None):
+        codes = self.plan_codes[plan][duration]
+        return codes if currency is None else codes[currency]
+
+
+_tables = TTLCache(maxsize=32)
@@ -0,0 +1,282 @@
+"""
+Bulk version of `forms.fetch_subscription_from_paystack`.
+
+    python -m shared.contrib.payment.reconcile app_label.ModelName \
+        [--chunk-size N] [--concurrency N] [--rate N] [--checkpoint PATH] \
+        [--retry-failed]
+
+`DJANGO_SETTINGS_MODULE` must be set. Only paid records are reconciled. An
+interrupted run resumes from the checkpoint; once a run completes, the
+checkpoint only lists the records that failed, which `--retry-failed`
+reconciles again. It is deleted when nothing is left to retry.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import time
+
+from shared.executors import Limiter, RateLimit, SingleFlight
+
+from .client import PaystackError, close_client, get_client
+
+logger = logging.getLogger(__name__)
+
+
+class Checkpoint(object):
+    """
+    Progress of a run, kept in a JSON file: the last reconciled primary key,
+    the running totals, the primary keys that failed, and whether the run
+    got to the end.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def load(self):
+        if self.path is None or not os.path.exists(self.path):
+            return {}
+        with open(self.path) as checkpoint:
+            return json.load(checkpoint)
+
+    def save(self, state):
+        if self.path is None:
+            return
+        temporary = self.path + ".tmp"
+        with open(temporary, "w") as checkpoint:
+            json.dump(state, checkpoint, default=str)
+        os.replace(temporary, self.path)
+
+    def clear(self):
+        if self.path is not None and os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def log_progress(stats):
+    logger.info(
+        "reconciled %(processed)d records (%(updated)d updated, %(skipped)d "
+        "skipped, %(failed)d failed) at %(rate).1f records/s",
+        stats,
+    )
+
+
+class SubscriptionReconciler(object):
+    """
+    Stores the Paystack subscription code and email token of every record
+    in `queryset` whose `extra_data["paystack_details"]` names a plan and a
+    customer.
+
+    Records are read in primary-key order, `chunk_size` at a time, so memory
+    stays flat and a run can resume from its `checkpoint` file; the
+    primary keys of records that failed are kept there for
+    `run(retry_failed=True)`. Plans are
+    looked up once per plan code; subscriptions are fetched with at most
+    `concurrency` requests in flight and `rate` requests per second, and
+    each chunk is written back with one `bulk_update`. `progress` is called
+    with the running totals after every chunk.
+    """
+
+    def __init__(
+        self,
+        queryset,
+        client=None,
+        chunk_size=200,
+        concurrency=8,
+        rate=10,
+        checkpoint=None,
+        progress=log_progress,
+    ):
+        self.queryset = queryset
+        self.client = client or get_client()
+        self.chunk_size = chunk_size
+        self.limiter = Limiter(concurrency)
+        self.rate_limit = RateLimit(rate, burst=concurrency)
+        self.checkpoint = Checkpoint(checkpoint)
+        self.progress = progress
+        self.plans = {}
+        self._plan_flights = SingleFlight()
+
+    async def call(self, method, *args, **kwargs):
+        async with self.limiter:
+            async with self.rate_limit:
+                return await method(*args, **kwargs)
+
+    async def get_plan(self, plan_code):
+        if plan_code not in self.plans:
+            plan, _ = await self._plan_flights.do(
+                plan_code, self.call, self.client.get_plan, plan_code
+            )
+            self.plans[plan_code] = plan
+        return self.plans[plan_code]
+
+    async def reconcile_record(self, record):
+        """Update `record.extra_data` in place; returns whether it changed."""
+        extra_data = record.extra_data or {}
+        details = extra_data.get("paystack_details") or {}
+        if not (details.get("plan") and details.get("customer")):
+            return False
+        plan_details = details.pop("plan_details", None) or await self.get_plan(
+            details["plan"]
+        )
+        if not plan_details:
+            raise PaystackError("Unknown plan %s" % details["plan"])
+        subscriptions = await self.call(
+            self.client.get_subscriptions,
+            plan=plan_details["id"],
+            customer=details["customer"]["id"],
+        )
+        if not subscriptions:
+            return False
+        extra_data["paystack_details"] = {
+            **details,
+            "plan_id": plan_details["id"],
+            "subscription_code": subscriptions[0]["subscription_code"],
+            "email_token": subscriptions[0]["email_token"],
+        }
+        record.extra_data = extra_data
+        return True
+
+    def fetch_chunk(self, queryset, last_pk):
+        queryset = queryset.order_by("pk")
+        if last_pk is not None:
+            queryset = queryset.filter(pk__gt=last_pk)
+        return list(queryset[: self.chunk_size])
+
+    def save_chunk(self, records):
+        if records:
+            self.queryset.model._default_manager.bulk_update(
+                records, ["extra_data"], batch_size=self.chunk_size
+            )
+
+    async def reconcile(self, queryset, last_pk, totals, failed, save):
+        """Reconcile `queryset` after `last_pk`, calling `save(records)` per chunk."""
+        from shared.starlette import database_sync_to_async
+
+        start = time.monotonic()
+        processed_before = totals["processed"]
+        while True:
+            records = await database_sync_to_async(self.fetch_chunk)(
+                queryset, last_pk
+            )
+            if not records:
+                break
+            results = await asyncio.gather(
+                *[self.reconcile_record(record) for record in records],
+                return_exceptions=True
+            )
+            changed = []
+            for record, result in zip(records, results):
+                if isinstance(result, Exception):
+                    logger.warning("Could not reconcile %s: %s", record.pk, result)
+                    totals["failed"] += 1
+                    failed.append(record.pk)
+                elif result:
+                    changed.append(record)
+                else:
+                    totals["skipped"] += 1
+            await database_sync_to_async(self.save_chunk)(changed)
+            totals["updated"] += len(changed)
+            totals["processed"] += len(records)
+            last_pk = records[-1].pk
+            save(records)
+            elapsed = time.monotonic() - start
+            totals["rate"] = (totals["processed"] - processed_before) / (
+                elapsed or 1e-9
+            )
+            if self.progress is not None:
+                self.progress(dict(totals))
+        return totals
+
+    async def run(self, retry_failed=False):
+        """
+        Reconcile every record, resuming an interrupted run; with
+        `retry_failed`, only the records that failed in earlier runs.
+        """
+        state = self.checkpoint.load()
+        if retry_failed:
+            return await self.retry(state)
+        if state.get("done"):
+            state = {}
+        totals = {"processed": 0, "updated": 0, "skipped": 0, "failed": 0}
+        totals.update(state.get("stats", {}))
+        failed = list(state.get("failed", []))
+
+        def save(records):
+            self.checkpoint.save(
+                {"last_pk": records[-1].pk, "stats": totals, "failed": failed}
+            )
+
+        await self.reconcile(
+            self.queryset, state.get("last_pk"), totals, failed, save
+        )
+        if failed:
+            self.checkpoint.save({"done": True, "stats": totals, "failed": failed})
+        else:
+            self.checkpoint.clear()
+        return totals
+
+    async def retry(self, state):
+        totals = {"processed": 0, "updated": 0, "skipped": 0, "failed": 0}
+        pending = state.get("failed")
+        if not pending:
+            return totals
+        failed, seen = [], set()
+
+        def save(records):
+            # failures so far plus the records this pass has not reached yet
+            seen.update(str(record.pk) for record in records)
+            remaining = [pk for pk in pending if str(pk) not in seen]
+            self.checkpoint.save(dict(state, failed=failed + remaining))
+
+        await self.reconcile(
+            self.queryset.filter(pk__in=pending), None, totals, failed, save
+        )
+        # records that no longer match the queryset are dropped
+        if failed or not state.get("done"):
+            self.checkpoint.save(dict(state, failed=failed))
+        else:
+            self.checkpoint.clear()
+        return totals
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("model", help="app_label.ModelName of a PaymentMixin model")
+    parser.add_argument("--chunk-size", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--rate", type=float, default=10)
+    parser.add_argument("--checkpoint", default="reconcile-checkpoint.json")
+    parser.add_argument(
+        "--retry-failed",
+        action="store_true",
+        help="only reconcile the records that failed in earlier runs",
+    )
+    args = parser.parse_args()
+
+    import django
+
+    django.setup()
+    from django.apps import apps
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    model = apps.get_model(args.model)
+    reconciler = SubscriptionReconciler(
+        model._default_manager.filter(made_payment=True),
+        chunk_size=args.chunk_size,
+        concurrency=args.concurrency,
+        rate=args.rate,
+        checkpoint=args.checkpoint,
+    )
+
+    async def run():
+        try:
+            return await reconciler.run(retry_failed=args.retry_failed)
+        finally:
+            await close_client()
+
+    print(json.dumps(asyncio.run(run())))
+
+
+if __name__ == "__main__":
+    main()
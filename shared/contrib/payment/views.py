@@ -3,12 +3,42 @@ from starlette.background import BackgroundTask
 from starlette.exceptions import HTTPException
 from starlette.responses import JSONResponse
 
+from shared.cache import TTLCache
+from shared.executors import SingleFlight
 from shared.starlette import create_asgi_app
 
-from . import forms
+from .client import close_client
 
 
-def create_payment_app_instance(services=forms, **kwargs):
+def create_payment_app_instance(
+    services=None, job_queue=None, verification_ttl=300, **kwargs
+):
+    """
+    `services` defaults to `shared.contrib.payment.forms`. With a `shared.jobs.JobQueue`, verified payments are processed by the
+    queue's workers instead of a background task in the request's process.
+
+    Concurrent verify-payment hits for the same order and `trxref` share one
+    upstream verification, and successful verifications are remembered for
+    `verification_ttl` seconds once processing is scheduled. With a job
+    queue every verified hit enqueues, which is a no-op once the job exists,
+    so a failed enqueue is retried by the next hit.
+    """
+    if services is None:
+        from . import forms as services
+    verifications = TTLCache(maxsize=4096, ttl=verification_ttl)
+    flights = SingleFlight()
+    # release the shared Paystack connection pool on shutdown
+    kwargs["on_shutdown"] = list(kwargs.get("on_shutdown") or []) + [close_client]
+    if job_queue is not None:
+        # the payment_verified receivers are not idempotent: a failed job is
+        # dead-lettered for a manual replay instead of sending the signal again
+        job_queue.register(
+            "process_paystack_payment",
+            services.process_paystack_payment,
+            max_attempts=1,
+        )
+        kwargs["on_startup"] = list(kwargs.get("on_startup") or []) + [job_queue.start]
+        kwargs["on_shutdown"].append(job_queue.stop)
     app = create_asgi_app(**kwargs)
 
     @app.route("/create-payment", methods=["POST"])
@@ -23,13 +53,36 @@ def create_payment_app_instance(services=forms, **kwargs):
     @app.route("/paystack/verify-payment/{order}/")
     async def paystack_verify_payment(request):
         order = request.path_params["order"]
-        url = determine_base_route(request._scope)
-        response = await services.paystack_verification(request.query_params)
+        url = determine_base_route(request.scope)
+        key = (order, request.query_params.get("trxref"))
+        response = verifications.get(key)
+        duplicate = response is not None
+        if response is None:
+            response, duplicate = await flights.do(
+                key, services.paystack_verification, request.query_params
+            )
+        if response[0] and duplicate and job_queue is None:
+            return JSONResponse({"success": True})
         if response[0]:
             paystack_response = None
             if len(response) == 3:
                 paystack_response = response[2]
+            if job_queue is not None:
+                params = dict(request.query_params)
+                await job_queue.enqueue(
+                    "process_paystack_payment",
+                    key="paystack:%s:%s" % (order, params.get("trxref")),
+                    payload={
+                        "request": params,
+                        "order": order,
+                        "kind": "paystack",
+                        "data": paystack_response,
+                    },
+                )
+                verifications.set(key, response)
+                return JSONResponse({"success": True})
             task = BackgroundTask(services.process_paystack_payment, request.query_params, order, "paystack", data=paystack_response)
+            verifications.set(key, response)
             return JSONResponse({"success": True}, background=task)
         return JSONResponse({"success": False}, status_code=400)
 
@@ -0,0 +1,108 @@
+from starlette.datastructures import Headers
+from starlette.middleware.cors import CORSMiddleware
+
+from .cache import TTLCache
+
+DEFAULT_POLICY = {
+    "allow_methods": ["*"],
+    "allow_origins": ["*"],
+    "allow_headers": ["*"],
+    "max_age": 600,
+}
+
+
+class CachedCORSMiddleware(CORSMiddleware):
+    """
+    `CORSMiddleware` that does its header work once per origin.
+
+    Preflight answers are cached per (origin, requested method, requested
+    headers) and replayed without building a response, with
+    `Access-Control-Max-Age` so browsers cache them too. The headers added
+    to other responses are precomputed per (origin, has cookie).
+    """
+
+    def __init__(self, app, cache_size=256, **kwargs):
+        super().__init__(app, **kwargs)
+        self._preflights = TTLCache(maxsize=cache_size)
+        self._simple = TTLCache(maxsize=cache_size)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        origin = request_method = requested_headers = None
+        has_cookie = False
+        for name, value in scope["headers"]:
+            if name == b"origin":
+                origin = value
+            elif name == b"access-control-request-method":
+                request_method = value
+            elif name == b"access-control-request-headers":
+                requested_headers = value
+            elif name == b"cookie":
+                has_cookie = True
+
+        if origin is None:
+            await self.app(scope, receive, send)
+            return
+
+        if scope["method"] == "OPTIONS" and request_method is not None:
+            key = (origin, request_method, requested_headers)
+            preflight = self._preflights.get(key)
+            if preflight is None:
+                response = self.preflight_response(request_headers=Headers(scope=scope))
+                preflight = (response.status_code, response.raw_headers, response.body)
+                self._preflights.set(key, preflight)
+            status_code, headers, body = preflight
+            await send(
+                {"type": "http.response.start", "status": status_code, "headers": headers}
+            )
+            await send({"type": "http.response.body", "body": body})
+            return
+
+        key = (origin, has_cookie)
+        extra = self._simple.get(key)
+        if extra is None:
+            extra = self.simple_headers_for(origin.decode("latin1"), has_cookie)
+            self._simple.set(key, extra)
+
+        async def send_with_cors(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = _merge_headers(message.get("headers", ()), extra)
+            await send(message)
+
+        await self.app(scope, receive, send_with_cors)
+
+    def simple_headers_for(self, origin, has_cookie):
+        headers = dict(self.simple_headers)
+        vary = False
+        # with cookies '*' is not accepted, so the origin is mirrored back
+        if self.allow_all_origins and has_cookie:
+            headers["Access-Control-Allow-Origin"] = origin
+        elif not self.allow_all_origins and self.is_allowed_origin(origin=origin):
+            headers["Access-Control-Allow-Origin"] = origin
+            vary = True
+        raw = [
+            (name.lower().encode("latin1"), value.encode("latin1"))
+            for name, value in headers.items()
+        ]
+        if vary:
+            raw.append((b"vary", b"Origin"))
+        return tuple(raw)
+
+
+def _merge_headers(headers, extra):
+    names = {name for name, _ in extra}
+    merged = []
+    vary = None
+    for name, value in headers:
+        if name == b"vary" and b"vary" in names:
+            vary = value
+        elif name not in names:
+            merged.append((name, value))
+    for name, value in extra:
+        if name == b"vary" and vary is not None:
+            value = vary + b", " + value
+        merged.append((name, value))
+    return merged
@@ -0,0 +1,200 @@
+from graphql.language import ast
+from graphql.type.definition import GraphQLList, GraphQLNonNull, get_named_type
+
+
+class QueryCostError(Exception):
+    def __init__(self, message, cost, depth, analyzer):
+        super().__init__(message)
+        self.cost = cost
+        self.depth = depth
+        self.analyzer = analyzer
+
+    def as_dict(self):
+        return {
+            "message": str(self),
+            "extensions": {
+                "code": "QUERY_TOO_COMPLEX",
+                "cost": self.cost,
+                "maxCost": self.analyzer.max_cost,
+                "depth": self.depth,
+                "maxDepth": self.analyzer.max_depth,
+            },
+        }
+
+
+class QueryCostAnalyzer(object):
+    """
+    Static cost and depth of a GraphQL operation, computed from the parsed
+    document before it is executed.
+
+    Every field costs `field_costs.get("Type.field", default_cost)`. A list
+    field multiplies the cost of its selection by the value of its first
+    `list_size_arguments` argument, or by `default_list_size` when none is
+    given. Introspection fields are free. Each fragment is walked once, and
+    the walk stops at the first limit it passes, so the cost and depth of
+    a rejected operation are lower bounds.
+    """
+
+    def __init__(
+        self,
+        max_depth=None,
+        max_cost=None,
+        field_costs=None,
+        default_cost=1,
+        default_list_size=10,
+        list_size_arguments=("first", "last", "limit"),
+    ):
+        self.max_depth = max_depth
+        self.max_cost = max_cost
+        self.field_costs = field_costs or {}
+        self.default_cost = default_cost
+        self.default_list_size = default_list_size
+        self.list_size_arguments = list_size_arguments
+        self.stats = {"analyzed": 0, "rejected": 0, "total_cost": 0, "max_cost": 0}
+
+    def analyze(self, schema, document, operation_name=None, variables=None):
+        """Return `(cost, depth)` of the operation that would be executed."""
+        operation = None
+        fragments = {}
+        for definition in document.definitions:
+            if isinstance(definition, ast.FragmentDefinition):
+                fragments[definition.name.value] = definition
+            elif isinstance(definition, ast.OperationDefinition):
+                name = definition.name.value if definition.name else None
+                if operation_name is None or name == operation_name:
+                    operation = operation or definition
+        if operation is None:
+            return 0, 0
+        root_type = {
+            "query": schema.get_query_type,
+            "mutation": schema.get_mutation_type,
+            "subscription": schema.get_subscription_type,
+        }[operation.operation]()
+        walker = _Walker(self, schema, fragments, variables or {})
+        try:
+            return walker.selection_set(operation.selection_set, root_type, ())
+        except _OverBudget as exc:
+            return exc.cost, exc.depth
+
+    def check(self, schema, document, operation_name=None, variables=None):
+        """Raise `QueryCostError` when the operation is over budget."""
+        cost, depth = self.analyze(schema, document, operation_name, variables)
+        self.stats["analyzed"] += 1
+        self.stats["total_cost"] += cost
+        self.stats["max_cost"] = max(self.stats["max_cost"], cost)
+        message = None
+        if self.max_depth is not None and depth > self.max_depth:
+            message = "Query depth %d exceeds the maximum of %d" % (depth, self.max_depth)
+        elif self.max_cost is not None and cost > self.max_cost:
+            message = "Query cost %d exceeds the maximum of %d" % (cost, self.max_cost)
+        if message:
+            self.stats["rejected"] += 1
+            raise QueryCostError(message, cost, depth, self)
+        return cost, depth
+
+
+class _OverBudget(Exception):
+    def __init__(self, cost, depth):
+        self.cost = cost
+        self.depth = depth
+
+
+class _Walker(object):
+    def __init__(self, analyzer, schema, fragments, variables):
+        self.analyzer = analyzer
+        self.schema = schema
+        self.fragments = fragments
+        self.variables = variables
+        # name -> (cost, depth); a fragment is walked once however often it is spread
+        self.fragment_costs = {}
+
+    def check(self, cost, depth):
+        analyzer = self.analyzer
+        if (analyzer.max_cost is not None and cost > analyzer.max_cost) or (
+            analyzer.max_depth is not None and depth > analyzer.max_depth
+        ):
+            raise _OverBudget(cost, depth)
+
+    def selection_set(self, selection_set, parent_type, seen_fragments, scale=1, level=0):
+        # `scale` is the product of the enclosing list sizes and `level` the
+        # depth of the parent, so the walk stops as soon as a limit is passed
+        cost = depth = 0
+        for selection in selection_set.selections:
+            if isinstance(selection, ast.Field):
+                field_cost, field_depth = self.field(
+                    selection, parent_type, seen_fragments, scale, level
+                )
+            elif isinstance(selection, ast.FragmentSpread):
+                field_cost, field_depth = self.fragment(
+                    selection.name.value, seen_fragments, scale, level
+                )
+            else:
+                fragment_type = parent_type
+                if selection.type_condition is not None:
+                    fragment_type = self.schema.get_type(selection.type_condition.name.value)
+                field_cost, field_depth = self.selection_set(
+                    selection.selection_set, fragment_type, seen_fragments, scale, level
+                )
+            cost += field_cost
+            depth = max(depth, field_depth)
+            self.check(cost * scale, level + depth)
+        return cost, depth
+
+    def fragment(self, name, seen_fragments, scale, level):
+        if name in self.fragment_costs:
+            return self.fragment_costs[name]
+        fragment = self.fragments.get(name)
+        if fragment is None or name in seen_fragments:
+            return 0, 0
+        result = self.fragment_costs[name] = self.selection_set(
+            fragment.selection_set,
+            self.schema.get_type(fragment.type_condition.name.value),
+            seen_fragments + (name,),
+            scale,
+            level,
+        )
+        return result
+
+    def field(self, field, parent_type, seen_fragments, scale=1, level=0):
+        name = field.name.value
+        if name.startswith("__"):
+            return 0, 0
+        field_def = getattr(parent_type, "fields", {}).get(name)
+        if field_def is None:
+            return 0, 1
+        analyzer = self.analyzer
+        cost = analyzer.field_costs.get(
+            "%s.%s" % (parent_type.name, name), analyzer.default_cost
+        )
+        if field.selection_set is None:
+            return cost, 1
+        self.check(0, level + 1)
+        size = self.list_size(field) if self.is_list(field_def.type) else 1
+        child_cost, child_depth = self.selection_set(
+            field.selection_set,
+            get_named_type(field_def.type),
+            seen_fragments,
+            scale * size,
+            level + 1,
+        )
+        return cost + child_cost * size, 1 + child_depth
+
+    @staticmethod
+    def is_list(type_):
+        while isinstance(type_, (GraphQLList, GraphQLNonNull)):
+            if isinstance(type_, GraphQLList):
+                return True
+            type_ = type_.of_type
+        return False
+
+    def list_size(self, field):
+        arguments = {argument.name.value: argument.value for argument in field.arguments or ()}
+        for name in self.analyzer.list_size_arguments:
+            value = arguments.get(name)
+            if isinstance(value, ast.Variable):
+                value = self.variables.get(value.name.value)
+            elif isinstance(value, ast.IntValue):
+                value = int(value.value)
+            if isinstance(value, int) and value >= 0:
+                return value
+        return self.analyzer.default_list_size
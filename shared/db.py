@@ -0,0 +1,113 @@
+import asyncio
+import threading
+import time
+
+from .executors import configure_pool, get_pool
+
+
+class DatabasePool(object):
+    """
+    Keeps the Django connections of the "db" executor pool's threads open
+    between `DatabaseSyncToAsync` calls, so the pool size caps the number of
+    connections. `max_threads` (and `max_queue`) resize that pool.
+
+    Connections are dropped as Django does at the end of a request: once
+    `CONN_MAX_AGE` has passed or after an error. A connection idle for more
+    than `health_check_interval` seconds is checked with `is_usable()`
+    before it is reused. With the default `CONN_MAX_AGE = 0` nothing is
+    reused; set it to the number of seconds a connection may live.
+    """
+
+    def __init__(self, max_threads=None, health_check_interval=30, max_queue=None):
+        self.health_check_interval = health_check_interval
+        if max_threads is None and max_queue is None:
+            self.executor = get_pool("db")
+        else:
+            options = {"max_workers": max_threads, "max_queue": max_queue}
+            self.executor = configure_pool(
+                "db", **{k: v for k, v in options.items() if v is not None}
+            )
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.opened = 0
+        self.reused = 0
+        self.discarded = 0
+
+    def checkout(self):
+        from django.db import close_old_connections, connections
+
+        close_old_connections()
+        last_used = getattr(self._local, "last_used", None)
+        check = (
+            last_used is not None
+            and time.monotonic() - last_used >= self.health_check_interval
+        )
+        open_aliases = set()
+        discarded = 0
+        for connection in connections.all():
+            if connection.connection is None:
+                continue
+            if check and not connection.is_usable():
+                connection.close()
+                discarded += 1
+                continue
+            open_aliases.add(connection.alias)
+        self._local.open_aliases = open_aliases
+        with self._lock:
+            self.calls += 1
+            self.reused += len(open_aliases)
+            self.discarded += discarded
+
+    def checkin(self):
+        from django.db import close_old_connections, connections
+
+        opened = sum(
+            1
+            for connection in connections.all()
+            if connection.connection is not None
+            and connection.alias not in self._local.open_aliases
+        )
+        close_old_connections()
+        self._local.last_used = time.monotonic()
+        if opened:
+            with self._lock:
+                self.opened += opened
+
+    async def warm(self, timeout=10):
+        """Open a connection on every thread of the pool."""
+        workers = self.executor.max_workers
+        barrier = threading.Barrier(workers)
+
+        def connect():
+            from django.db import connections
+
+            self.checkout()
+            try:
+                for connection in connections.all():
+                    connection.ensure_connection()
+            finally:
+                self.checkin()
+            # hold this thread until every worker has one, so each call
+            # lands on a different thread
+            try:
+                barrier.wait(timeout)
+            except threading.BrokenBarrierError:
+                pass
+
+        await asyncio.gather(
+            *[asyncio.wrap_future(self.executor.submit(connect)) for _ in range(workers)]
+        )
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+
+    @property
+    def stats(self):
+        return {
+            "max_threads": self.executor.max_workers,
+            "calls": self.calls,
+            "opened": self.opened,
+            "reused": self.reused,
+            "discarded": self.discarded,
+        }
@@ -0,0 +1,127 @@
+import logging
+import os
+import random
+import uuid
+
+from .cache import TTLCache
+from .executors import PoolSaturated
+from .responses import JSONResponse
+
+logger = logging.getLogger(__name__)
+
+
+def debug_from_env(default=False):
+    """Read the DEBUG environment variable ("1", "true", "yes", "on")."""
+    value = os.environ.get("DEBUG")
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+def fingerprint(exc):
+    """
+    Identify an exception by its type and the frame that raised it, without
+    formatting the traceback.
+    """
+    tb = exc.__traceback__
+    while tb is not None and tb.tb_next is not None:
+        tb = tb.tb_next
+    if tb is None:
+        return (type(exc).__qualname__, None, None)
+    return (type(exc).__qualname__, tb.tb_frame.f_code.co_filename, tb.tb_lineno)
+
+
+class ErrorReporter(object):
+    """
+    Production exception handler. Answers with a compact JSON error that
+    carries a correlation id (also sent as `X-Error-Id`) and never formats
+    the traceback on the request path.
+
+    The first occurrence of each fingerprint within `window` seconds is
+    logged with its traceback (and sent to Sentry with `sentry=True`);
+    repeats are only reported at `sample_rate`.
+    """
+
+    def __init__(self, sample_rate=0.01, window=60, sentry=False, maxsize=1024):
+        self.sample_rate = sample_rate
+        self.sentry = sentry
+        self.seen = TTLCache(maxsize=maxsize, ttl=window)
+        self.errors = 0
+        self.reported = 0
+
+    def __call__(self, request, exc):
+        error_id = uuid.uuid4().hex
+        self.report(request, exc, error_id)
+        return JSONResponse(
+            {"detail": "Internal Server Error", "error_id": error_id},
+            status_code=500,
+            headers={"X-Error-Id": error_id},
+        )
+
+    def report(self, request, exc, error_id):
+        self.errors += 1
+        key = fingerprint(exc)
+        count = self.seen.get(key)
+        if count is None:
+            self.seen.set(key, [1])
+        else:
+            count[0] += 1
+            if random.random() >= self.sample_rate:
+                return
+        self.reported += 1
+        logger.error(
+            "Unhandled %s on %s %s (error_id=%s, seen=%d)",
+            type(exc).__name__,
+            request.method,
+            request.url.path,
+            error_id,
+            1 if count is None else count[0],
+            exc_info=(type(exc), exc, exc.__traceback__),
+        )
+        if self.sentry:
+            import sentry_sdk
+
+            with sentry_sdk.push_scope() as scope:
+                scope.set_tag("error_id", error_id)
+                sentry_sdk.capture_exception(exc)
+
+    @property
+    def stats(self):
+        return {"errors": self.errors, "reported": self.reported}
+
+
+def pool_saturated_response(request, exc):
+    return JSONResponse(
+        {"detail": "Service Unavailable", "pool": exc.name},
+        status_code=503,
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+
+class BackpressureMiddleware(object):
+    """
+    Answers `PoolSaturated` raised anywhere below it, including from
+    middleware such as authentication, with a 503 and `Retry-After`.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        started = []
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                started.append(True)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except PoolSaturated as exc:
+            if started:
+                raise
+            response = pool_saturated_response(None, exc)
+            await response(scope, receive, send)
@@ -0,0 +1,254 @@
+import asyncio
+import contextvars
+import functools
+import os
+import threading
+import time
+from concurrent.futures import Executor, ThreadPoolExecutor
+
+from .metrics import REGISTRY
+
+
+class Limiter(object):
+    """
+    Caps how many offloaded calls may run at once.
+
+    Callers past the limit wait their turn; `stats` reports the current queue
+    depth and how long callers have waited so far.
+    """
+
+    def __init__(self, limit=None):
+        self.limit = limit
+        self.waiting = 0
+        self.in_flight = 0
+        self.calls = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self._semaphore = None
+
+    async def __aenter__(self):
+        if self.limit is not None:
+            if self._semaphore is None:
+                self._semaphore = asyncio.Semaphore(self.limit)
+            start = time.monotonic()
+            self.waiting += 1
+            try:
+                await self._semaphore.acquire()
+            finally:
+                self.waiting -= 1
+            wait = time.monotonic() - start
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+        self.in_flight += 1
+        self.calls += 1
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.in_flight -= 1
+        if self._semaphore is not None:
+            self._semaphore.release()
+
+    @property
+    def stats(self):
+        return {
+            "limit": self.limit,
+            "waiting": self.waiting,
+            "in_flight": self.in_flight,
+            "calls": self.calls,
+            "total_wait": self.total_wait,
+            "max_wait": self.max_wait,
+        }
+
+
+class PoolSaturated(Exception):
+    """Raised instead of queueing when an `ExecutorPool` is full."""
+
+    def __init__(self, name, retry_after=1):
+        super().__init__("Executor pool {!r} is saturated".format(name))
+        self.name = name
+        self.retry_after = retry_after
+
+
+class ExecutorPool(Executor):
+    """
+    A named thread pool that holds at most `max_workers` running and
+    `max_queue` waiting calls. Submitting past that raises `PoolSaturated`
+    right away so callers can answer 503 instead of piling up. Usable
+    anywhere an executor is, e.g. `loop.run_in_executor(pool, func)`.
+    """
+
+    def __init__(self, name, max_workers=10, max_queue=100, retry_after=1):
+        self.name = name
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.retry_after = retry_after
+        self.pending = 0
+        self.calls = 0
+        self.rejected = 0
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix=name
+        )
+        self._lock = threading.Lock()
+        REGISTRY.track("executor", name, self)
+
+    def submit(self, fn, *args, **kwargs):
+        with self._lock:
+            if (
+                self.max_queue is not None
+                and self.pending >= self.max_workers + self.max_queue
+            ):
+                self.rejected += 1
+                raise PoolSaturated(self.name, self.retry_after)
+            self.pending += 1
+            self.calls += 1
+        try:
+            future = self._executor.submit(fn, *args, **kwargs)
+        except BaseException:
+            self._release(None)
+            raise
+        future.add_done_callback(self._release)
+        return future
+
+    def _release(self, future):
+        with self._lock:
+            self.pending -= 1
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
+
+    async def run(self, func, *args, **kwargs):
+        context = contextvars.copy_context()
+        child = functools.partial(func, *args, **kwargs)
+        return await asyncio.wrap_future(self.submit(context.run, child))
+
+    @property
+    def stats(self):
+        return {
+            "max_workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "pending": self.pending,
+            "queued": max(0, self.pending - self.max_workers),
+            "calls": self.calls,
+            "rejected": self.rejected,
+        }
+
+
+POOL_DEFAULTS = {
+    "db": {"max_workers": 10},
+    "http": {"max_workers": 10},
+    # each StreamingJSONResponse download holds one thread until it ends
+    "stream": {"max_workers": 10},
+    "cpu": {"max_workers": os.cpu_count() or 2},
+}
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def configure_pool(name, **options):
+    """Create (or replace) the named pool, e.g. `configure_pool("http", max_workers=20)`."""
+    pool = ExecutorPool(name, **{**POOL_DEFAULTS.get(name, {}), **options})
+    with _pools_lock:
+        previous, _pools[name] = _pools.get(name), pool
+    if previous is not None:
+        previous.shutdown(wait=False)
+    return pool
+
+
+def get_pool(name):
+    pool = _pools.get(name)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(name)
+            if pool is None:
+                pool = _pools[name] = ExecutorPool(name, **POOL_DEFAULTS.get(name, {}))
+    return pool
+
+
+async def run_in_pool(name, func, *args, **kwargs):
+    return await get_pool(name).run(func, *args, **kwargs)
+
+
+def in_pool(name):
+    """Decorator turning a blocking function into a coroutine run on the named pool."""
+
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            return await get_pool(name).run(func, *args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+class SingleFlight(object):
+    """
+    Collapses concurrent calls that share a key: the first caller runs the
+    coroutine function and later callers await its outcome instead of
+    running it again. `do` returns `(result, shared)`, where `shared` tells
+    a follower apart from the caller that did the work.
+    """
+
+    def __init__(self):
+        self._calls = {}
+
+    def __len__(self):
+        return len(self._calls)
+
+    async def do(self, key, func, *args, **kwargs):
+        future = self._calls.get(key)
+        if future is not None:
+            return await asyncio.shield(future), True
+        future = self._calls[key] = asyncio.get_event_loop().create_future()
+        try:
+            result = await func(*args, **kwargs)
+        except BaseException as exc:
+            if isinstance(exc, asyncio.CancelledError):
+                future.cancel()
+            else:
+                future.set_exception(exc)
+                # followers re-raise it; don't warn when there are none
+                future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result, False
+        finally:
+            del self._calls[key]
+
+
+class RateLimit(object):
+    """
+    Token bucket allowing `rate` acquisitions per second on average, with
+    bursts of up to `burst`. Use as `async with rate_limit:`.
+    """
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self._lock = None
+
+    async def acquire(self):
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(
+                    self.burst, self.tokens + (now - self.updated) * self.rate
+                )
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    async def __aenter__(self):
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        pass
@@ -0,0 +1,342 @@
+import gzip
+import hashlib
+import json
+import os
+import sys
+import urllib.request
+
+from starlette.requests import Request
+from starlette.responses import PlainTextResponse, Response
+
+from .cache import TTLCache
+from .utils import negotiate_encoding
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# where `vendor_assets` writes and `GraphiQLPage` looks by default; point
+# GRAPHIQL_STATIC_DIR at a writable build directory, not site-packages
+STATIC_DIR = os.environ.get("GRAPHIQL_STATIC_DIR") or os.path.join(
+    os.path.dirname(__file__), "static", "graphiql"
+)
+
+# name: (CDN url, media type, tag template), in page order
+ASSETS = [
+    (
+        "graphiql.css",
+        "//cdn.jsdelivr.net/npm/graphiql@0.12.0/graphiql.css",
+        "text/css",
+        '<link href="{}" rel="stylesheet"/>',
+    ),
+    (
+        "fetch.min.js",
+        "//cdn.jsdelivr.net/npm/whatwg-fetch@2.0.3/fetch.min.js",
+        "application/javascript",
+        '<script src="{}"></script>',
+    ),
+    (
+        "react.production.min.js",
+        "//cdn.jsdelivr.net/npm/react@16.2.0/umd/react.production.min.js",
+        "application/javascript",
+        '<script src="{}"></script>',
+    ),
+    (
+        "react-dom.production.min.js",
+        "//cdn.jsdelivr.net/npm/react-dom@16.2.0/umd/react-dom.production.min.js",
+        "application/javascript",
+        '<script src="{}"></script>',
+    ),
+    (
+        "graphiql.min.js",
+        "//cdn.jsdelivr.net/npm/graphiql@0.12.0/graphiql.min.js",
+        "application/javascript",
+        '<script src="{}"></script>',
+    ),
+]
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+
+class StaticContent(object):
+    """
+    A body kept in memory together with its gzip and brotli variants. Each
+    variant has its own strong ETag (`"<hash>"`, `"<hash>-gzip"`,
+    `"<hash>-br"`), since they are different representations. Variants
+    found next to the file on disk (`name.gz`, `name.br`) are used as is;
+    missing ones are compressed once here.
+    """
+
+    def __init__(self, content, media_type, cache_control, path=None):
+        self.media_type = media_type
+        self.cache_control = cache_control
+        digest = hashlib.sha256(content).hexdigest()[:32]
+        self.etag = '"%s"' % digest
+        self.variants = {"identity": content}
+        gz = _read(path + ".gz") if path else None
+        self.variants["gzip"] = gz or gzip.compress(content, 9)
+        br = _read(path + ".br") if path else None
+        if br or brotli is not None:
+            self.variants["br"] = br or brotli.compress(content)
+        self.etags = {encoding: '"%s-%s"' % (digest, encoding) for encoding in self.variants}
+        self.etags["identity"] = self.etag
+
+    def response(self, request: Request) -> Response:
+        encoding = negotiate_encoding(
+            request.headers.get("accept-encoding", ""), ("br", "gzip")
+        )
+        if encoding not in self.variants:
+            encoding = "identity"
+        headers = {
+            "ETag": self.etags[encoding],
+            "Cache-Control": self.cache_control,
+            "Vary": "Accept-Encoding",
+        }
+        if_none_match = request.headers.get("if-none-match", "")
+        if headers["ETag"] in (tag.strip() for tag in if_none_match.split(",")):
+            return Response(b"", status_code=304, headers=headers)
+        if encoding != "identity":
+            headers["Content-Encoding"] = encoding
+        return Response(
+            self.variants[encoding], media_type=self.media_type, headers=headers
+        )
+
+
+def _read(path):
+    try:
+        with open(path, "rb") as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+class GraphiQLPage(object):
+    """
+    The GraphiQL page, rendered once per request path, plus the vendored
+    assets it links to. Assets missing from `static_dir` are linked from
+    the CDN instead.
+
+    No assets ship with the package, so out of the box every asset comes
+    from the CDN. To serve them locally, run `python -m shared.graphiql
+    DIR` as a build step and set `GRAPHIQL_STATIC_DIR=DIR` (or pass
+    `static_dir`).
+    """
+
+    def __init__(self, static_dir=STATIC_DIR):
+        self.assets = {}
+        for name, _, media_type, _ in ASSETS:
+            path = os.path.join(static_dir, name)
+            content = _read(path)
+            if content is not None:
+                self.assets[name] = StaticContent(content, media_type, IMMUTABLE, path)
+        self.pages = TTLCache(maxsize=32)
+
+    def render(self, path):
+        tags = []
+        for name, url, _, tag in ASSETS:
+            asset = self.assets.get(name)
+            if asset is not None:
+                url = "%s?graphiql_asset=%s&v=%s" % (path, name, asset.etag[1:13])
+            tags.append("    " + tag.format(url))
+        text = GRAPHIQL.replace("{{ASSETS}}", "\n".join(tags))
+        text = text.replace("{{REQUEST_PATH}}", json.dumps(path))
+        return StaticContent(
+            text.encode("utf-8"), "text/html", "no-cache"
+        )
+
+    def page_response(self, request: Request) -> Response:
+        path = request.url.path
+        page = self.pages.get(path)
+        if page is None:
+            page = self.render(path)
+            self.pages.set(path, page)
+        return page.response(request)
+
+    def asset_response(self, request: Request, name) -> Response:
+        asset = self.assets.get(name)
+        if asset is None:
+            return PlainTextResponse("Not Found", status_code=404)
+        return asset.response(request)
+
+
+def vendor_assets(static_dir):
+    """Download the GraphiQL assets with precompressed variants into `static_dir`."""
+    os.makedirs(static_dir, exist_ok=True)
+    for name, url, _, _ in ASSETS:
+        with urllib.request.urlopen("https:" + url) as response:
+            content = response.read()
+        path = os.path.join(static_dir, name)
+        with open(path, "wb") as f:
+            f.write(content)
+        with open(path + ".gz", "wb") as f:
+            f.write(gzip.compress(content, 9))
+        if brotli is not None:
+            with open(path + ".br", "wb") as f:
+                f.write(brotli.compress(content, quality=11))
+        print("vendored", name)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        sys.exit("usage: python -m shared.graphiql DIR")
+    vendor_assets(sys.argv[1])
+
+
+GRAPHIQL = """
+<!--
+ *  Copyright (c) Facebook, Inc.
+ *  All rights reserved.
+ *
+ *  This source code is licensed under the license found in the
+ *  LICENSE file in the root directory of this source tree.
+-->
+<!DOCTYPE html>
+<html>
+  <head>
+    <style>
+      body {
+        height: 100%;
+        margin: 0;
+        width: 100%;
+        overflow: hidden;
+      }
+      #graphiql {
+        height: 100vh;
+      }
+       .headers {
+            display: block;
+            margin:1rem;
+            font-family: sans-serif;
+        }
+        .headers label {
+            font-weight: bold;
+        }
+    </style>
+    <!--
+      This GraphiQL example depends on Promise and fetch, which are available in
+      modern browsers, but can be "polyfilled" for older browsers.
+      GraphiQL itself depends on React DOM.
+      If you do not want to rely on a CDN, you can host these files locally or
+      include them directly in your favored resource bunder.
+    -->
+{{ASSETS}}
+  </head>
+  <body>
+    <div class="headers">
+        <label for="token">Bearer Token:</label>   <input type="text" name="token" class="token">
+        <button class="js-token-clear">Clear</button>
+    </div>
+    <div id="graphiql">Loading...</div>
+    <script>
+      /**
+       * This GraphiQL example illustrates how to use some of GraphiQL's props
+       * in order to enable reading and updating the URL parameters, making
+       * link sharing of queries a little bit easier.
+       *
+       * This is only one example of this kind of feature, GraphiQL exposes
+       * various React params to enable interesting integrations.
+       */
+      // Parse the search string to get url parameters.
+      var search = window.location.search;
+      var parameters = {};
+      search.substr(1).split('&').forEach(function (entry) {
+        var eq = entry.indexOf('=');
+        if (eq >= 0) {
+          parameters[decodeURIComponent(entry.slice(0, eq))] =
+            decodeURIComponent(entry.slice(eq + 1));
+        }
+      });
+      // if variables was provided, try to format it.
+      if (parameters.variables) {
+        try {
+          parameters.variables =
+            JSON.stringify(JSON.parse(parameters.variables), null, 2);
+        } catch (e) {
+          // Do nothing, we want to display the invalid JSON as a string, rather
+          // than present an error.
+        }
+      }
+      // When the query and variables string is edited, update the URL bar so
+      // that it can be easily shared
+      function onEditQuery(newQuery) {
+        parameters.query = newQuery;
+        updateURL();
+      }
+      function onEditVariables(newVariables) {
+        parameters.variables = newVariables;
+        updateURL();
+      }
+      function onEditOperationName(newOperationName) {
+        parameters.operationName = newOperationName;
+        updateURL();
+      }
+      function updateURL() {
+        var newSearch = '?' + Object.keys(parameters).filter(function (key) {
+          return Boolean(parameters[key]);
+        }).map(function (key) {
+          return encodeURIComponent(key) + '=' +
+            encodeURIComponent(parameters[key]);
+        }).join('&');
+        history.replaceState(null, null, newSearch);
+      }
+      // Defines a GraphQL fetcher using the fetch API. You're not required to
+      // use fetch, and could instead implement graphQLFetcher however you like,
+      // as long as it returns a Promise or Observable.
+      function graphQLFetcher(graphQLParams) {
+        // This example expects a GraphQL server at the path /graphql.
+        // Change this to point wherever you host your GraphQL server.
+        var token = document.querySelector(".token").value;
+        token = token || localStorage.getItem("token")
+        var headers = {
+            'Accept': 'application/json',
+            'Content-Type': 'application/json',
+          }
+        if(token) {
+          localStorage.setItem("token", token)
+          headers['Authorization'] = 'Bearer ' + token
+        }
+        let hostUrl = window.location.origin+window.location.pathname
+        return fetch(hostUrl, {
+          method: 'post',
+          headers: headers,
+          body: JSON.stringify(graphQLParams),
+          credentials: 'include',
+        }).then(function (response) {
+          return response.text();
+        }).then(function (responseBody) {
+          try {
+            return JSON.parse(responseBody);
+          } catch (error) {
+            return responseBody;
+          }
+        });
+      }
+      // Render <GraphiQL /> into the body.
+      // See the README in the top level of this module to learn more about
+      // how you can customize GraphiQL by providing different values or
+      // additional child elements.
+      ReactDOM.render(
+        React.createElement(GraphiQL, {
+          fetcher: graphQLFetcher,
+          query: parameters.query,
+          variables: parameters.variables,
+          operationName: parameters.operationName,
+          onEditQuery: onEditQuery,
+          onEditVariables: onEditVariables,
+          onEditOperationName: onEditOperationName
+        }),
+        document.getElementById('graphiql')
+      );
+      var token = localStorage.getItem("token");
+      if(token){
+        document.querySelector(".token").value = token;
+      }
+      document.querySelector(".js-token-clear").onclick = function(){
+        localStorage.removeItem("token")
+        document.querySelector(".token").value = '';
+      }
+    </script>
+  </body>
+</html>
+"""
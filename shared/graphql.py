@@ -1,172 +1,320 @@
+import hashlib
+import inspect
 import json
-from starlette.graphql import GraphQLApp, Response, Request, HTMLResponse
+import typing
+
+from graphql.error import GraphQLError
+from graphql.error import format_error as format_graphql_error
+from graphql.execution import ExecutionResult, execute
+from graphql.language.base import parse
+from graphql.language.source import Source
+from graphql.validation import validate
+from starlette import status
+from starlette.background import BackgroundTasks
+from starlette.concurrency import run_in_threadpool
+from starlette.graphql import GraphQLApp, Response, Request
+from starlette.responses import PlainTextResponse
+
+from .cache import TTLCache
+from .cost import QueryCostError
+from .loaders import LoaderRegistry
+from .metrics import timed
+from .responses import JSONResponse
+
+
+def query_hash(query: str) -> str:
+    return hashlib.sha256(query.encode("utf-8")).hexdigest()
+
+
+async def maybe_await(value):
+    if inspect.isawaitable(value):
+        return await value
+    return value
+
+
+class PersistedQueryStore(object):
+    """
+    In-memory store for Automatic Persisted Queries, keyed by sha256 digest.
+
+    Any object with `get(query_hash)` and `set(query_hash, query)` methods can
+    stand in for it (e.g. one backed by Redis); both may be coroutines.
+    """
+
+    def __init__(self, maxsize=1000):
+        self.queries = TTLCache(maxsize=maxsize)
+
+    def get(self, query_hash):
+        return self.queries.get(query_hash)
+
+    def set(self, query_hash, query):
+        self.queries.set(query_hash, query)
+
+
+class PersistedQueryError(Exception):
+    def __init__(self, message, code):
+        super().__init__(message)
+        self.code = code
+
+    def as_dict(self):
+        return {"message": str(self), "extensions": {"code": self.code}}
+
+
+class DocumentError(Exception):
+    def __init__(self, errors):
+        super().__init__(errors)
+        self.errors = errors
 
 
 class CGraphQLApp(GraphQLApp):
+    """
+    GraphQLApp that keeps an LRU of parsed and validated documents, keyed by
+    the sha256 of the query, and supports Automatic Persisted Queries.
+
+    Pass `persisted_queries=False` to turn APQ off. `loaders` maps names to
+    DataLoader factories; each request gets its own `LoaderRegistry` in
+    `context["loaders"]`. Loaders are asyncio based, so resolvers that use
+    them need `executor_class=AsyncioExecutor`. A `cost_analyzer`
+    (`shared.cost.QueryCostAnalyzer`) rejects over-budget operations before
+    they run.
+    """
+
+    def __init__(
+        self,
+        schema,
+        executor=None,
+        executor_class=None,
+        graphiql=True,
+        document_cache_size=256,
+        persisted_queries=None,
+        loaders=None,
+        cost_analyzer=None,
+    ):
+        options = {"executor_class": executor_class, "graphiql": graphiql}
+        if executor is not None:
+            # Starlette 0.15 dropped the `executor` argument
+            options["executor"] = executor
+        super().__init__(schema, **options)
+        self.documents = TTLCache(maxsize=document_cache_size)
+        if persisted_queries is None:
+            persisted_queries = PersistedQueryStore()
+        self.persisted_queries = persisted_queries
+        self.loaders = loaders or {}
+        self.cost_analyzer = cost_analyzer
+        self._graphiql_page = None
+
+    @property
+    def graphiql_page(self):
+        # imported on first use so the template stays out of memory when
+        # GraphiQL is disabled
+        if self._graphiql_page is None:
+            from .graphiql import GraphiQLPage
+
+            self._graphiql_page = GraphiQLPage()
+        return self._graphiql_page
+
+    def warm(self, queries=(), path="/graphql"):
+        """
+        Parse and validate the introspection query and `queries` into the
+        document cache, and pre-render the GraphiQL page served at `path`.
+        """
+        from graphql.utils.introspection_query import introspection_query
+
+        for query in (introspection_query,) + tuple(queries):
+            try:
+                self.get_document(query)
+            except DocumentError:
+                pass
+        if self.graphiql:
+            page = self.graphiql_page
+            page.pages.set(path, page.render(path))
+
     async def handle_graphiql(self, request: Request) -> Response:
-        text = GRAPHIQL.replace("{{REQUEST_PATH}}", json.dumps(
-            request.url.path))
-        return HTMLResponse(text)
-
-
-GRAPHIQL = """
-<!--
- *  Copyright (c) Facebook, Inc.
- *  All rights reserved.
- *
- *  This source code is licensed under the license found in the
- *  LICENSE file in the root directory of this source tree.
--->
-<!DOCTYPE html>
-<html>
-  <head>
-    <style>
-      body {
-        height: 100%;
-        margin: 0;
-        width: 100%;
-        overflow: hidden;
-      }
-      #graphiql {
-        height: 100vh;
-      }
-       .headers {
-            display: block;
-            margin:1rem;
-            font-family: sans-serif;
-        }
-        .headers label {
-            font-weight: bold;
-        }
-    </style>
-    <!--
-      This GraphiQL example depends on Promise and fetch, which are available in
-      modern browsers, but can be "polyfilled" for older browsers.
-      GraphiQL itself depends on React DOM.
-      If you do not want to rely on a CDN, you can host these files locally or
-      include them directly in your favored resource bunder.
-    -->
-    <link href="//cdn.jsdelivr.net/npm/graphiql@0.12.0/graphiql.css" rel="stylesheet"/>
-    <script src="//cdn.jsdelivr.net/npm/whatwg-fetch@2.0.3/fetch.min.js"></script>
-    <script src="//cdn.jsdelivr.net/npm/react@16.2.0/umd/react.production.min.js"></script>
-    <script src="//cdn.jsdelivr.net/npm/react-dom@16.2.0/umd/react-dom.production.min.js"></script>
-    <script src="//cdn.jsdelivr.net/npm/graphiql@0.12.0/graphiql.min.js"></script>
-  </head>
-  <body>
-    <div class="headers">
-        <label for="token">Bearer Token:</label>   <input type="text" name="token" class="token">
-        <button class="js-token-clear">Clear</button>
-    </div>
-    <div id="graphiql">Loading...</div>
-    <script>
-      /**
-       * This GraphiQL example illustrates how to use some of GraphiQL's props
-       * in order to enable reading and updating the URL parameters, making
-       * link sharing of queries a little bit easier.
-       *
-       * This is only one example of this kind of feature, GraphiQL exposes
-       * various React params to enable interesting integrations.
-       */
-      // Parse the search string to get url parameters.
-      var search = window.location.search;
-      var parameters = {};
-      search.substr(1).split('&').forEach(function (entry) {
-        var eq = entry.indexOf('=');
-        if (eq >= 0) {
-          parameters[decodeURIComponent(entry.slice(0, eq))] =
-            decodeURIComponent(entry.slice(eq + 1));
-        }
-      });
-      // if variables was provided, try to format it.
-      if (parameters.variables) {
-        try {
-          parameters.variables =
-            JSON.stringify(JSON.parse(parameters.variables), null, 2);
-        } catch (e) {
-          // Do nothing, we want to display the invalid JSON as a string, rather
-          // than present an error.
+        asset = request.query_params.get("graphiql_asset")
+        if asset is not None:
+            return self.graphiql_page.asset_response(request, asset)
+        return self.graphiql_page.page_response(request)
+
+    async def get_request_data(self, request: Request):
+        if request.method in ("GET", "HEAD"):
+            if (
+                "text/html" in request.headers.get("Accept", "")
+                or "graphiql_asset" in request.query_params
+            ):
+                if not self.graphiql:
+                    return PlainTextResponse(
+                        "Not Found", status_code=status.HTTP_404_NOT_FOUND
+                    )
+                return await self.handle_graphiql(request)
+            return request.query_params
+
+        if request.method == "POST":
+            content_type = request.headers.get("Content-Type", "")
+            if "application/json" in content_type:
+                return await request.json()
+            if "application/graphql" in content_type:
+                body = await request.body()
+                return {"query": body.decode()}
+            if "query" in request.query_params:
+                return request.query_params
+            return PlainTextResponse(
+                "Unsupported Media Type",
+                status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            )
+
+        return PlainTextResponse(
+            "Method Not Allowed", status_code=status.HTTP_405_METHOD_NOT_ALLOWED
+        )
+
+    async def resolve_query(self, data) -> typing.Tuple[str, str]:
+        """
+        Return `(query, query_hash)` for the request, resolving and
+        registering persisted queries along the way.
+        """
+        query = data.get("query")
+        extensions = data.get("extensions") or {}
+        if isinstance(extensions, str):
+            extensions = json.loads(extensions)
+        persisted = (
+            extensions.get("persistedQuery") if isinstance(extensions, dict) else None
+        )
+        if not persisted:
+            if not isinstance(query, str):
+                raise ValueError("No GraphQL query found in the request")
+            return query, query_hash(query)
+
+        if self.persisted_queries is False:
+            raise PersistedQueryError(
+                "PersistedQueryNotSupported", "PERSISTED_QUERY_NOT_SUPPORTED"
+            )
+        digest = persisted.get("sha256Hash")
+        if query is None:
+            query = await maybe_await(self.persisted_queries.get(digest))
+            if query is None:
+                raise PersistedQueryError(
+                    "PersistedQueryNotFound", "PERSISTED_QUERY_NOT_FOUND"
+                )
+            return query, digest
+        if not isinstance(query, str) or query_hash(query) != digest:
+            raise ValueError("provided sha does not match query")
+        await maybe_await(self.persisted_queries.set(digest, query))
+        return query, digest
+
+    def get_document(self, query: str, digest: str = None):
+        """
+        Return the parsed and validated document for `query`. Raises a
+        `DocumentError` carrying the parse or validation errors.
+        """
+        digest = digest or query_hash(query)
+        document = self.documents.get(digest)
+        if document is None:
+            try:
+                with timed("graphql_parse"):
+                    document = parse(Source(query, "GraphQL request"))
+            except GraphQLError as error:
+                raise DocumentError([error])
+            with timed("graphql_validate"):
+                errors = validate(self.schema, document)
+            if errors:
+                raise DocumentError(errors)
+            self.documents.set(digest, document)
+        return document
+
+    async def handle_graphql(self, request: Request) -> Response:
+        data = await self.get_request_data(request)
+        if isinstance(data, Response):
+            return data
+
+        try:
+            query, digest = await self.resolve_query(data)
+        except PersistedQueryError as error:
+            # clients answer these by resending the full query, so keep a 200
+            return JSONResponse({"data": None, "errors": [error.as_dict()]})
+        except ValueError as error:
+            return PlainTextResponse(
+                str(error), status_code=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            document = self.get_document(query, digest)
+        except DocumentError as exc:
+            return self.error_response(exc.errors)
+
+        variables = data.get("variables")
+        if isinstance(variables, str):
+            try:
+                variables = json.loads(variables)
+            except ValueError:
+                return PlainTextResponse(
+                    "Variables are invalid JSON.",
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                )
+        operation_name = data.get("operationName")
+        if self.cost_analyzer is not None:
+            try:
+                self.cost_analyzer.check(
+                    self.schema, document, operation_name, variables
+                )
+            except QueryCostError as error:
+                return JSONResponse(
+                    {"data": None, "errors": [error.as_dict()]},
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                )
+
+        background = BackgroundTasks()
+        context = {
+            "request": request,
+            "background": background,
+            "loaders": LoaderRegistry(self.loaders),
         }
-      }
-      // When the query and variables string is edited, update the URL bar so
-      // that it can be easily shared
-      function onEditQuery(newQuery) {
-        parameters.query = newQuery;
-        updateURL();
-      }
-      function onEditVariables(newVariables) {
-        parameters.variables = newVariables;
-        updateURL();
-      }
-      function onEditOperationName(newOperationName) {
-        parameters.operationName = newOperationName;
-        updateURL();
-      }
-      function updateURL() {
-        var newSearch = '?' + Object.keys(parameters).filter(function (key) {
-          return Boolean(parameters[key]);
-        }).map(function (key) {
-          return encodeURIComponent(key) + '=' +
-            encodeURIComponent(parameters[key]);
-        }).join('&');
-        history.replaceState(null, null, newSearch);
-      }
-      // Defines a GraphQL fetcher using the fetch API. You're not required to
-      // use fetch, and could instead implement graphQLFetcher however you like,
-      // as long as it returns a Promise or Observable.
-      function graphQLFetcher(graphQLParams) {
-        // This example expects a GraphQL server at the path /graphql.
-        // Change this to point wherever you host your GraphQL server.
-        var token = document.querySelector(".token").value;
-        token = token || localStorage.getItem("token")
-        var headers = {
-            'Accept': 'application/json',
-            'Content-Type': 'application/json',
-          }
-        if(token) {
-          localStorage.setItem("token", token)
-          headers['Authorization'] = 'Bearer ' + token
+
+        result = await self.execute(
+            document, variables=variables, context=context, operation_name=operation_name
+        )
+        error_data = (
+            [format_graphql_error(err) for err in result.errors]
+            if result.errors
+            else None
+        )
+        response_data = {"data": result.data, "errors": error_data}
+        status_code = (
+            status.HTTP_400_BAD_REQUEST if result.errors else status.HTTP_200_OK
+        )
+        return JSONResponse(
+            response_data, status_code=status_code, background=background
+        )
+
+    def error_response(self, errors, status_code=status.HTTP_400_BAD_REQUEST):
+        response_data = {
+            "data": None,
+            "errors": [format_graphql_error(err) for err in errors],
         }
-        let hostUrl = window.location.origin+window.location.pathname
-        return fetch(hostUrl, {
-          method: 'post',
-          headers: headers,
-          body: JSON.stringify(graphQLParams),
-          credentials: 'include',
-        }).then(function (response) {
-          return response.text();
-        }).then(function (responseBody) {
-          try {
-            return JSON.parse(responseBody);
-          } catch (error) {
-            return responseBody;
-          }
-        });
-      }
-      // Render <GraphiQL /> into the body.
-      // See the README in the top level of this module to learn more about
-      // how you can customize GraphiQL by providing different values or
-      // additional child elements.
-      ReactDOM.render(
-        React.createElement(GraphiQL, {
-          fetcher: graphQLFetcher,
-          query: parameters.query,
-          variables: parameters.variables,
-          operationName: parameters.operationName,
-          onEditQuery: onEditQuery,
-          onEditVariables: onEditVariables,
-          onEditOperationName: onEditOperationName
-        }),
-        document.getElementById('graphiql')
-      );
-      var token = localStorage.getItem("token");
-      if(token){
-        document.querySelector(".token").value = token;
-      }
-      document.querySelector(".js-token-clear").onclick = function(){
-        localStorage.removeItem("token")
-        document.querySelector(".token").value = '';
-      }
-    </script>
-  </body>
-</html>
-"""
+        return JSONResponse(response_data, status_code=status_code)
+
+    async def execute(  # type: ignore
+        self, query, variables=None, context=None, operation_name=None
+    ):
+        document = query
+        if isinstance(query, str):
+            try:
+                document = self.get_document(query)
+            except DocumentError as exc:
+                return ExecutionResult(errors=exc.errors, invalid=True)
+        kwargs = dict(
+            context_value=context,
+            variable_values=variables,
+            operation_name=operation_name,
+        )
+        try:
+            with timed("graphql_execute"):
+                if self.is_async:
+                    return await execute(
+                        self.schema,
+                        document,
+                        executor=self.executor,
+                        return_promise=True,
+                        **kwargs
+                    )
+                return await run_in_threadpool(
+                    execute, self.schema, document, **kwargs
+                )
+        except Exception as error:
+            return ExecutionResult(errors=[error], invalid=True)
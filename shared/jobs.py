@@ -0,0 +1,274 @@
+import asyncio
+import json
+import logging
+import random
+import sqlite3
+import threading
+import time
+
+from .executors import run_in_pool
+from .metrics import REGISTRY
+from .serializers import DecimalEncoder
+
+logger = logging.getLogger(__name__)
+
+
+class SQLiteJobStore(object):
+    """
+    Job storage in a SQLite file, for single-host and local use. Any object
+    with the same methods can back a `JobQueue`.
+
+    Claimed jobs are leased; a job whose worker died is picked up again once
+    its lease runs out. Jobs that exhaust their attempts are moved to the
+    `dead_letters` table.
+    """
+
+    def __init__(self, path="jobs.sqlite3"):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.row_factory = sqlite3.Row
+        if path != ":memory:":
+            self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                key TEXT NOT NULL UNIQUE,
+                name TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'queued',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                run_at REAL NOT NULL,
+                locked_until REAL,
+                last_error TEXT,
+                created_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS jobs_ready ON jobs (status, run_at);
+            CREATE TABLE IF NOT EXISTS dead_letters (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                key TEXT NOT NULL,
+                name TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                attempts INTEGER NOT NULL,
+                error TEXT,
+                failed_at REAL NOT NULL
+            );
+            """
+        )
+
+    def add(self, key, name, payload, run_at):
+        """Insert a job; returns `False` when `key` is already known."""
+        with self._lock:
+            cursor = self._db.execute(
+                "INSERT OR IGNORE INTO jobs (key, name, payload, run_at, created_at)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (key, name, payload, run_at, time.time()),
+            )
+        return cursor.rowcount == 1
+
+    def claim(self, now, lease):
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._db.execute(
+                    "SELECT * FROM jobs WHERE (status = 'queued' AND run_at <= ?)"
+                    " OR (status = 'running' AND locked_until < ?)"
+                    " ORDER BY run_at LIMIT 1",
+                    (now, now),
+                ).fetchone()
+                if row is not None:
+                    self._db.execute(
+                        "UPDATE jobs SET status = 'running', locked_until = ?,"
+                        " attempts = attempts + 1 WHERE id = ?",
+                        (now + lease, row["id"]),
+                    )
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        if row is None:
+            return None
+        job = dict(row)
+        job["attempts"] += 1
+        return job
+
+    def complete(self, job_id):
+        with self._lock:
+            self._db.execute(
+                "UPDATE jobs SET status = 'done', locked_until = NULL WHERE id = ?",
+                (job_id,),
+            )
+
+    def retry(self, job_id, run_at, error):
+        with self._lock:
+            self._db.execute(
+                "UPDATE jobs SET status = 'queued', run_at = ?, locked_until = NULL,"
+                " last_error = ? WHERE id = ?",
+                (run_at, error, job_id),
+            )
+
+    def bury(self, job, error):
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                self._db.execute(
+                    "INSERT INTO dead_letters (key, name, payload, attempts, error,"
+                    " failed_at) VALUES (?, ?, ?, ?, ?, ?)",
+                    (
+                        job["key"],
+                        job["name"],
+                        job["payload"],
+                        job["attempts"],
+                        error,
+                        time.time(),
+                    ),
+                )
+                self._db.execute("DELETE FROM jobs WHERE id = ?", (job["id"],))
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+
+    def prune(self, before):
+        """Forget finished jobs created before `before` (their keys can be reused)."""
+        with self._lock:
+            self._db.execute(
+                "DELETE FROM jobs WHERE status = 'done' AND created_at < ?", (before,)
+            )
+
+    def dead_letters(self, limit=100):
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT * FROM dead_letters ORDER BY id DESC LIMIT ?", (limit,)
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+
+class JobQueue(object):
+    """
+    Durable queue for work that should neither hold up a response nor be
+    lost when the worker restarts.
+
+    Handlers are registered by name and called with the job payload as
+    keyword arguments; plain functions run through `DatabaseSyncToAsync`.
+    Enqueueing a `key` that is already queued or done is a no-op, which
+    makes retried webhooks and double clicks safe. Failed jobs are retried
+    up to `max_attempts` times with jittered exponential backoff, then moved
+    to the store's dead letters; register side-effecting handlers that must
+    not run twice with `max_attempts=1`. At most `concurrency` jobs run at
+    once.
+    """
+
+    def __init__(
+        self,
+        store,
+        concurrency=4,
+        max_attempts=5,
+        backoff=2.0,
+        max_backoff=300.0,
+        lease=300.0,
+        poll_interval=1.0,
+        name="default",
+    ):
+        self.store = store
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.lease = lease
+        self.poll_interval = poll_interval
+        self.handlers = {}
+        self.attempts = {}
+        self.processed = 0
+        self.retried = 0
+        self.dead = 0
+        self._workers = []
+        self._wakeup = None
+        REGISTRY.track("jobs", name, self)
+
+    def register(self, name, handler=None, max_attempts=None):
+        if handler is None:
+            return lambda handler: self.register(name, handler, max_attempts)
+        from .backends import is_async_callable
+        from .starlette import database_sync_to_async
+
+        if not is_async_callable(handler):
+            handler = database_sync_to_async(handler)
+        self.handlers[name] = handler
+        self.attempts[name] = max_attempts or self.max_attempts
+        return handler
+
+    async def enqueue(self, name, key, payload=None, delay=0):
+        """Store a job; returns `False` when `key` was already enqueued."""
+        if name not in self.handlers:
+            raise KeyError("No job handler registered for %r" % name)
+        encoded = json.dumps(payload or {}, cls=DecimalEncoder)
+        created = await run_in_pool(
+            "db", self.store.add, key, name, encoded, time.time() + delay
+        )
+        if created and self._wakeup is not None:
+            self._wakeup.set()
+        return created
+
+    async def run_once(self):
+        """Claim and run one due job; returns `False` when none was due."""
+        job = await run_in_pool("db", self.store.claim, time.time(), self.lease)
+        if job is None:
+            return False
+        try:
+            handler = self.handlers[job["name"]]
+            await handler(**json.loads(job["payload"]))
+        except Exception as exc:
+            error = "%s: %s" % (type(exc).__name__, exc)
+            max_attempts = self.attempts.get(job["name"], self.max_attempts)
+            if job["attempts"] >= max_attempts:
+                logger.exception("Job %s failed for good", job["key"])
+                await run_in_pool("db", self.store.bury, job, error)
+                self.dead += 1
+            else:
+                delay = min(self.max_backoff, self.backoff * 2 ** (job["attempts"] - 1))
+                delay *= random.uniform(0.5, 1.0)
+                await run_in_pool(
+                    "db", self.store.retry, job["id"], time.time() + delay, error
+                )
+                self.retried += 1
+        else:
+            await run_in_pool("db", self.store.complete, job["id"])
+            self.processed += 1
+        return True
+
+    async def work(self):
+        while True:
+            try:
+                ran = await self.run_once()
+            except Exception:
+                logger.exception("Job queue worker error")
+                ran = False
+            if not ran:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def start(self):
+        self._wakeup = asyncio.Event()
+        self._workers = [
+            asyncio.ensure_future(self.work()) for _ in range(self.concurrency)
+        ]
+
+    async def stop(self):
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    @property
+    def stats(self):
+        return {
+            "workers": len(self._workers),
+            "processed": self.processed,
+            "retried": self.retried,
+            "dead": self.dead,
+        }
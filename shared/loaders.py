@@ -0,0 +1,154 @@
+import asyncio
+from collections import defaultdict
+
+
+class DataLoader(object):
+    """
+    Batches every `load(key)` made in the same event-loop tick into a single
+    `batch_load(keys)` call. Keys are deduplicated and results are cached for
+    the life of the loader, which is one request when used via
+    `LoaderRegistry`.
+
+    `batch_load` must return one value per key, in order; an `Exception`
+    value fails only the load for that key.
+    """
+
+    def __init__(self, batch_load=None):
+        if batch_load is not None:
+            self.batch_load = batch_load
+        self._futures = {}
+        self._queue = []
+
+    async def batch_load(self, keys):
+        raise NotImplementedError
+
+    def load(self, key) -> asyncio.Future:
+        future = self._futures.get(key)
+        if future is None:
+            loop = asyncio.get_event_loop()
+            future = loop.create_future()
+            self._futures[key] = future
+            if not self._queue:
+                loop.call_soon(self._dispatch)
+            self._queue.append((key, future))
+        return future
+
+    async def load_many(self, keys):
+        return await asyncio.gather(*[self.load(key) for key in keys])
+
+    def clear(self, key):
+        self._futures.pop(key, None)
+
+    def _dispatch(self):
+        queue, self._queue = self._queue, []
+        asyncio.ensure_future(self._run(queue))
+
+    async def _run(self, queue):
+        keys = [key for key, _ in queue]
+        try:
+            values = await self.batch_load(keys)
+            if len(values) != len(keys):
+                raise ValueError(
+                    "batch_load returned %d values for %d keys" % (len(values), len(keys))
+                )
+        except Exception as exc:
+            for key, future in queue:
+                self._futures.pop(key, None)
+                if not future.done():
+                    future.set_exception(exc)
+            return
+        for (key, future), value in zip(queue, values):
+            if future.done():
+                continue
+            if isinstance(value, Exception):
+                self._futures.pop(key, None)
+                future.set_exception(value)
+            else:
+                future.set_result(value)
+
+
+class ModelLoader(DataLoader):
+    """Loads one instance of `model` per key by `field`; misses load as None."""
+
+    def __init__(self, model, field="pk", queryset=None):
+        super().__init__()
+        self.model = model
+        self.field = field
+        self.queryset = queryset
+
+    def get_queryset(self):
+        if self.queryset is not None:
+            return self.queryset.all()
+        return self.model._default_manager.all()
+
+    async def batch_load(self, keys):
+        from .starlette import database_sync_to_async
+
+        return await database_sync_to_async(self.fetch)(keys)
+
+    def fetch(self, keys):
+        queryset = self.get_queryset().filter(**{"%s__in" % self.field: keys})
+        found = {getattr(instance, self.field): instance for instance in queryset}
+        return [found.get(key) for key in keys]
+
+
+class RelatedListLoader(ModelLoader):
+    """Loads the list of `model` instances whose `field` equals each key."""
+
+    def fetch(self, keys):
+        queryset = self.get_queryset().filter(**{"%s__in" % self.field: keys})
+        found = defaultdict(list)
+        for instance in queryset:
+            found[getattr(instance, self.field)].append(instance)
+        return [found.get(key, []) for key in keys]
+
+
+class UserLoader(ModelLoader):
+    """Users (`AbstractUser` subclasses) by primary key."""
+
+    def __init__(self, model, queryset=None):
+        super().__init__(model, field="pk", queryset=queryset)
+
+
+class PaymentsByUserLoader(RelatedListLoader):
+    """Payments (`PaymentMixin` subclasses) by the id in their `user` field."""
+
+    def __init__(self, model, queryset=None):
+        super().__init__(model, field="user", queryset=queryset)
+
+
+def default_loaders(user_model=None, payment_model=None):
+    """Loader factories for `CGraphQLApp(loaders=...)`."""
+    factories = {}
+    if user_model is not None:
+        factories["users"] = lambda: UserLoader(user_model)
+    if payment_model is not None:
+        factories["payments"] = lambda: ModelLoader(payment_model, field="order")
+        factories["payments_by_user"] = lambda: PaymentsByUserLoader(payment_model)
+    return factories
+
+
+class LoaderRegistry(object):
+    """
+    Request-scoped loaders, created on first access from `factories`, a
+    mapping of name to zero-argument callable. Available to resolvers as
+    `info.context["loaders"]`, e.g. `info.context["loaders"].users.load(pk)`.
+    """
+
+    def __init__(self, factories=None):
+        self._factories = factories or {}
+        self._loaders = {}
+
+    def get(self, name):
+        loader = self._loaders.get(name)
+        if loader is None:
+            loader = self._loaders[name] = self._factories[name]()
+        return loader
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        try:
+            return self.get(name)
+        except KeyError:
+            raise AttributeError(name)
@@ -0,0 +1,217 @@
+import bisect
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_labels(labelnames, labels, extra=None):
+    pairs = list(zip(labelnames, labels))
+    if extra is not None:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    body = ",".join(
+        '{}="{}"'.format(
+            name,
+            str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"'),
+        )
+        for name, value in pairs
+    )
+    return "{" + body + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter(object):
+    kind = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = list(self._values.items())
+        for labels, value in values:
+            yield self.name + _format_labels(self.labelnames, labels), value
+
+
+class Histogram(object):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                # per-bucket counts (last one is +Inf), sum
+                entry = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][index] += 1
+            entry[1] += value
+
+    def samples(self):
+        with self._lock:
+            values = [(labels, list(counts), total) for labels, (counts, total) in self._values.items()]
+        bounds = self.buckets + (float("inf"),)
+        for labels, counts, total in values:
+            cumulative = 0
+            for bound, count in zip(bounds, counts):
+                cumulative += count
+                yield self.name + "_bucket" + _format_labels(
+                    self.labelnames, labels, ("le", _format_value(bound))
+                ), cumulative
+            yield self.name + "_sum" + _format_labels(self.labelnames, labels), total
+            yield self.name + "_count" + _format_labels(self.labelnames, labels), cumulative
+
+
+class Registry(object):
+    """
+    Holds the process-wide metrics and renders them in the Prometheus text
+    format. Stage timers are no-ops until `enabled` is set, which
+    `MetricsMiddleware` does when it is installed.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.metrics = []
+        self._tracked = []
+
+    def counter(self, name, documentation, labelnames=()):
+        metric = Counter(name, documentation, labelnames)
+        self.metrics.append(metric)
+        return metric
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        metric = Histogram(name, documentation, labelnames, buckets)
+        self.metrics.append(metric)
+        return metric
+
+    def track(self, prefix, name, source):
+        """
+        Export the numeric entries of `source.stats` as `<prefix>_<key>`
+        gauges labelled `name="<name>"`, e.g. a `Limiter` or a
+        `QueryCostAnalyzer`.
+        """
+        self._tracked.append((prefix, name, weakref.ref(source)))
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.append("# HELP {} {}".format(metric.name, metric.documentation))
+            lines.append("# TYPE {} {}".format(metric.name, metric.kind))
+            for sample, value in metric.samples():
+                lines.append("{} {}".format(sample, _format_value(value)))
+        gauges = {}
+        for prefix, name, ref in list(self._tracked):
+            source = ref()
+            if source is None:
+                self._tracked.remove((prefix, name, ref))
+                continue
+            for key, value in source.stats.items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    gauges.setdefault("{}_{}".format(prefix, key), []).append(
+                        (name, value)
+                    )
+        for metric, values in gauges.items():
+            lines.append("# TYPE {} gauge".format(metric))
+            for name, value in values:
+                lines.append(
+                    "{}{} {}".format(
+                        metric, _format_labels(("name",), (name,)), _format_value(value)
+                    )
+                )
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+REQUESTS = REGISTRY.counter(
+    "http_requests_total", "Requests by route, method and status.", ("route", "method", "status")
+)
+REQUEST_DURATION = REGISTRY.histogram(
+    "http_request_duration_seconds", "Request latency by route.", ("route", "method")
+)
+STAGE_DURATION = REGISTRY.histogram(
+    "stage_duration_seconds",
+    "Time spent in auth, graphql parse/validate/execute, db and json render.",
+    ("stage",),
+)
+
+
+@contextmanager
+def timed(stage):
+    """Record the time spent in the block under `stage`."""
+    if not REGISTRY.enabled:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_DURATION.observe(time.perf_counter() - start, stage)
+
+
+def route_name(scope):
+    endpoint = scope.get("endpoint")
+    if endpoint is None:
+        return "unmatched"
+    return getattr(endpoint, "__name__", None) or type(endpoint).__name__
+
+
+class MetricsMiddleware(object):
+    """
+    Records request counts and latency per route. Routes are labelled by
+    endpoint name rather than path so the label set stays bounded.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        REGISTRY.enabled = True
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        status = [500]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = route_name(scope)
+            REQUEST_DURATION.observe(time.perf_counter() - start, route, scope["method"])
+            REQUESTS.inc(route, scope["method"], status[0])
+
+
+async def metrics_endpoint(request):
+    from starlette.responses import Response
+
+    return Response(
+        REGISTRY.render(), media_type="text/plain; version=0.0.4"
+    )
@@ -0,0 +1,174 @@
+import asyncio
+import contextvars
+import itertools
+import threading
+import typing
+
+from starlette.responses import Response, StreamingResponse
+
+from .executors import get_pool
+from .metrics import timed
+from .serializers import DecimalEncoder, get_default_serializer
+
+
+class JSONResponse(Response):
+    media_type = "application/json"
+    # swap for any object with a `dumps(content) -> bytes` method
+    serializer = get_default_serializer()
+
+    def render(self, content: typing.Any) -> bytes:
+        with timed("json_render"):
+            return self.serializer.dumps(content)
+
+
+class StreamingJSONResponse(StreamingResponse):
+    """
+    Stream a sequence of items as a JSON array, or as NDJSON with `ndjson=True`.
+
+    `content` may be an async iterable, a list, or any other iterable. Other
+    iterables are consumed in a thread of the "stream" executor pool, so a
+    QuerySet is read with `.iterator()` and never held in memory as a whole.
+    The thread is held for the whole download, which is why it does not
+    come from the "db" pool; `configure_pool("stream", max_workers=...)`
+    caps concurrent downloads. The thread is claimed before the status line
+    is sent, so a saturated pool raises `PoolSaturated` (a 503) instead of
+    cutting a 200 short. Items are encoded with `JSONResponse.serializer`,
+    `chunk_size` at a time.
+    """
+
+    media_type = "application/json"
+
+    def __init__(
+        self,
+        content: typing.Any,
+        status_code: int = 200,
+        headers: dict = None,
+        media_type: str = None,
+        background=None,
+        ndjson: bool = False,
+        chunk_size: int = 500,
+    ) -> None:
+        self.ndjson = ndjson
+        self.chunk_size = chunk_size
+        self.content = content
+        self.producer = None
+        if media_type is None and ndjson:
+            media_type = "application/x-ndjson"
+        super().__init__(
+            self.render_chunks(content),
+            status_code=status_code,
+            headers=headers,
+            media_type=media_type,
+            background=background,
+        )
+
+    async def __call__(self, scope, receive, send):
+        if self.in_thread(self.content):
+            self.producer = ThreadProducer(self.content, self.chunk_size)
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            if self.producer is not None:
+                await self.producer.close()
+
+    @staticmethod
+    def in_thread(content):
+        return not hasattr(content, "__aiter__") and not isinstance(
+            content, (list, tuple)
+        )
+
+    async def render_chunks(self, content):
+        dumps = JSONResponse.serializer.dumps
+        if not self.ndjson:
+            yield b"["
+        first = True
+        async for items in self.iterate_chunks(content):
+            if self.ndjson:
+                yield b"".join(dumps(item) + b"\n" for item in items)
+                continue
+            body = b",".join(dumps(item) for item in items)
+            yield body if first else b"," + body
+            first = False
+        if not self.ndjson:
+            yield b"]"
+
+    async def iterate_chunks(self, content):
+        if hasattr(content, "__aiter__"):
+            items = []
+            async for item in content:
+                items.append(item)
+                if len(items) >= self.chunk_size:
+                    yield items
+                    items = []
+            if items:
+                yield items
+        elif isinstance(content, (list, tuple)):
+            for start in range(0, len(content), self.chunk_size):
+                yield content[start:start + self.chunk_size]
+        else:
+            producer = self.producer or ThreadProducer(content, self.chunk_size)
+            async for items in producer.chunks():
+                yield items
+
+
+class ThreadProducer(object):
+    """
+    Reads an iterable on the "stream" executor pool, at most two chunks
+    ahead of the consumer. A single thread reads it all, so a QuerySet
+    keeps its cursor and connection; submitting raises `PoolSaturated`
+    right away when the pool is full.
+    """
+
+    def __init__(self, content, chunk_size):
+        self.loop = asyncio.get_event_loop()
+        self.queue = asyncio.Queue()
+        self.slots = threading.Semaphore(2)
+        self.stopped = threading.Event()
+        self.closed = False
+        context = contextvars.copy_context()
+        self.future = asyncio.wrap_future(
+            get_pool("stream").submit(context.run, self.produce, content, chunk_size)
+        )
+
+    def produce(self, content, chunk_size):
+        from django.db import close_old_connections, connections
+
+        loop, queue = self.loop, self.queue
+        try:
+            if hasattr(content, "iterator"):
+                iterator = content.iterator(chunk_size=chunk_size)
+            else:
+                iterator = iter(content)
+            while True:
+                self.slots.acquire()
+                if self.stopped.is_set():
+                    return
+                items = list(itertools.islice(iterator, chunk_size))
+                loop.call_soon_threadsafe(queue.put_nowait, items)
+                if not items:
+                    return
+        except Exception as exc:
+            loop.call_soon_threadsafe(queue.put_nowait, exc)
+        finally:
+            close_old_connections()
+            connections.close_all()
+
+    async def chunks(self):
+        try:
+            while True:
+                items = await self.queue.get()
+                if isinstance(items, Exception):
+                    raise items
+                if not items:
+                    break
+                self.slots.release()
+                yield items
+        finally:
+            await self.close()
+
+    async def close(self):
+        if not self.closed:
+            self.closed = True
+            self.stopped.set()
+            self.slots.release()
+            await self.future
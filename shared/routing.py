@@ -0,0 +1,154 @@
+import asyncio
+
+from starlette.datastructures import URL
+from starlette.responses import PlainTextResponse, RedirectResponse
+
+from .responses import JSONResponse
+
+
+class _Node(object):
+    __slots__ = ("children", "app", "path")
+
+    def __init__(self):
+        self.children = {}
+        self.app = None
+        self.path = None
+
+
+class PrefixDispatcher(object):
+    """
+    Dispatches to mounted ASGI apps by the longest matching path prefix.
+
+    Mount paths are compiled into a trie of path segments up front, so a
+    lookup costs one dict hit per segment of the request path whatever the
+    number of mounts. As with `Mount`, the matched prefix is moved from
+    `path` to `root_path`. With `routes_path` set, that path answers with a
+    JSON listing of the compiled routes. Lifespan events are forwarded to
+    every mount that handles them; when one fails to start, the mounts that
+    already started are shut down again, newest first.
+    """
+
+    def __init__(self, mounts, routes_path=None):
+        self.root = _Node()
+        self.routes = []
+        self.routes_path = routes_path
+        for path, app in mounts:
+            self.add(path, app)
+
+    def add(self, path, app):
+        path = "/" + path.strip("/") if path.strip("/") else ""
+        node = self.root
+        for segment in path.split("/")[1:]:
+            node = node.children.setdefault(segment, _Node())
+        node.app = app
+        node.path = path
+        self.routes.append({"path": path or "/", "app": _describe(app)})
+
+    def resolve(self, path):
+        """Return `(app, prefix)` for `path`, or `(None, None)`."""
+        node = self.root
+        found = (node.app, node.path)
+        for segment in path.split("/")[1:]:
+            node = node.children.get(segment)
+            if node is None:
+                break
+            if node.app is not None:
+                found = (node.app, node.path)
+        return found
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self.lifespan(scope, receive, send)
+            return
+        path = scope["path"]
+        if self.routes_path is not None and path == self.routes_path:
+            response = JSONResponse(self.routes)
+            await response(scope, receive, send)
+            return
+        app, prefix = self.resolve(path)
+        if app is None:
+            response = PlainTextResponse("Not Found", status_code=404)
+            await response(scope, receive, send)
+            return
+        remaining = path[len(prefix):]
+        if not remaining:
+            # a mount only matches below its prefix, like `Mount` does
+            if scope["type"] == "http":
+                url = URL(scope=scope)
+                response = RedirectResponse(url.replace(path=url.path + "/"))
+                await response(scope, receive, send)
+            return
+        root_path = scope.get("root_path", "")
+        child_scope = dict(scope)
+        child_scope.update(
+            {
+                "app_root_path": scope.get("app_root_path", root_path),
+                "root_path": root_path + prefix,
+                "path": remaining,
+            }
+        )
+        await app(child_scope, receive, send)
+
+    async def lifespan(self, scope, receive, send):
+        message = await receive()
+        assert message["type"] == "lifespan.startup"
+        mounts = []
+        for route_app in {id(app): app for app in self.mounted_apps()}.values():
+            mount = _MountLifespan(route_app, scope)
+            reply = await mount.send("lifespan.startup")
+            if reply is None:
+                # Django's handler and WSGI mounts reject lifespan scopes
+                continue
+            if reply["type"] == "lifespan.startup.failed":
+                # undo the mounts that did start, newest first
+                for started in reversed(mounts):
+                    await started.send("lifespan.shutdown")
+                await send(reply)
+                return
+            mounts.append(mount)
+        await send({"type": "lifespan.startup.complete"})
+        message = await receive()
+        assert message["type"] == "lifespan.shutdown"
+        for mount in reversed(mounts):
+            await mount.send("lifespan.shutdown")
+        await send({"type": "lifespan.shutdown.complete"})
+
+    def mounted_apps(self):
+        nodes = [self.root]
+        while nodes:
+            node = nodes.pop()
+            if node.app is not None:
+                yield node.app
+            nodes.extend(node.children.values())
+
+
+class _MountLifespan(object):
+    """Runs one mount's lifespan protocol in its own task."""
+
+    def __init__(self, app, scope):
+        self.inbox = asyncio.Queue()
+        self.outbox = asyncio.Queue()
+        self.task = asyncio.ensure_future(self.run(app, dict(scope)))
+
+    async def run(self, app, scope):
+        try:
+            await app(scope, self.inbox.get, self.outbox.put)
+        except Exception:
+            pass
+        finally:
+            await self.outbox.put(None)
+
+    async def send(self, event_type):
+        """Send an event and return the reply, or `None` once the app exited."""
+        if self.task.done() and self.outbox.empty():
+            return None
+        await self.inbox.put({"type": event_type})
+        return await self.outbox.get()
+
+
+def _describe(app):
+    name = getattr(app, "__name__", None) or type(app).__name__
+    inner = getattr(app, "app", None)
+    if inner is not None and inner is not app:
+        return "%s(%s)" % (name, _describe(inner))
+    return name
@@ -0,0 +1,94 @@
+import decimal
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class DecimalEncoder(json.JSONEncoder):
+    def default(self, obj):
+        if isinstance(obj, decimal.Decimal):
+            return str(obj)
+        return json.JSONEncoder.default(self, obj)
+
+
+class JSONSerializer(object):
+    """Compact, non-ASCII JSON via the stdlib, with Decimals as strings."""
+
+    def dumps(self, content) -> bytes:
+        return json.dumps(
+            content,
+            ensure_ascii=False,
+            allow_nan=False,
+            indent=None,
+            separators=(",", ":"),
+            cls=DecimalEncoder,
+        ).encode("utf-8")
+
+
+def _orjson_default(obj):
+    if isinstance(obj, decimal.Decimal):
+        return str(obj)
+    raise TypeError(f"Object of type {obj.__class__.__name__} is not JSON serializable")
+
+
+def _has_non_finite(content):
+    # iterative, exact types first: this runs on every strict payload with a null
+    stack = [content]
+    pop, push = stack.pop, stack.extend
+    while stack:
+        value = pop()
+        kind = type(value)
+        if kind is dict:
+            push(value.values())
+        elif kind is list or kind is tuple:
+            push(value)
+        elif kind is float:
+            # NaN - NaN and inf - inf are both NaN
+            if value - value != 0.0:
+                return True
+        elif value is None or kind is str or kind is int or kind is bool:
+            continue
+        elif isinstance(value, float):
+            if value - value != 0.0:
+                return True
+        elif isinstance(value, dict):
+            push(value.values())
+        elif isinstance(value, (list, tuple)):
+            push(value)
+    return False
+
+
+class OrjsonSerializer(JSONSerializer):
+    """
+    Same output as `JSONSerializer`, produced by orjson.
+
+    orjson writes NaN and Infinity as `null`; like `allow_nan=False`, this
+    raises `ValueError` for them instead. Only payloads whose output has a
+    `null` are searched for out-of-range floats, which brings those down to
+    about twice the stdlib speed; pass `strict_nan=False` to skip the
+    search and accept `null` for them. Payloads orjson refuses (e.g. integers
+    wider than 64 bits) are handed to the stdlib serializer.
+    """
+
+    def __init__(self, strict_nan=True):
+        self.strict_nan = strict_nan
+
+    def dumps(self, content) -> bytes:
+        try:
+            body = orjson.dumps(
+                content, default=_orjson_default, option=orjson.OPT_NON_STR_KEYS
+            )
+        except orjson.JSONEncodeError:
+            return super().dumps(content)
+        if self.strict_nan and b"null" in body and _has_non_finite(content):
+            raise ValueError("Out of range float values are not JSON compliant")
+        return body
+
+
+def get_default_serializer():
+    if orjson is not None:
+        return OrjsonSerializer()
+    return JSONSerializer()
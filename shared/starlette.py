@@ -1,121 +1,358 @@
+import functools
+import importlib
 import traceback
 import html
-import decimal
-import typing
-import json
 from starlette.applications import Starlette
 from starlette.responses import Response, HTMLResponse, PlainTextResponse
 from starlette.requests import Request
 from starlette.exceptions import ExceptionMiddleware
 from starlette.background import BackgroundTask
-from .graphql import CGraphQLApp as GraphQLApp
 from starlette.requests import HTTPConnection
-from starlette.middleware.wsgi import WSGIMiddleware
-from starlette.routing import Router, Mount
-from asgiref.sync import sync_to_async, async_to_sync, SyncToAsync
-from starlette.middleware.authentication import AuthenticationMiddleware
-from starlette.authentication import requires
-from starlette.middleware.cors import CORSMiddleware
-from sentry_asgi import SentryMiddleware
-import sentry_sdk
-from .backends import GraphqlBackend
-
-
-class DecimalEncoder(json.JSONEncoder):
-    def default(self, obj):
-        if isinstance(obj, decimal.Decimal):
-            return str(obj)
-        return json.JSONEncoder.default(self, obj)
-
-
-class JSONResponse(Response):
-    media_type = "application/json"
-
-    def render(self, content: typing.Any) -> bytes:
-        return json.dumps(
-            content,
-            ensure_ascii=False,
-            allow_nan=False,
-            indent=None,
-            separators=(",", ":"),
-            cls=DecimalEncoder,
-        ).encode("utf-8")
+
+# Optional components are imported by the code paths that enable them;
+# these names stay importable from this module on first access.
+_LAZY_IMPORTS = {
+    "sync_to_async": ("asgiref.sync", "sync_to_async"),
+    "async_to_sync": ("asgiref.sync", "async_to_sync"),
+    "SyncToAsync": ("asgiref.sync", "SyncToAsync"),
+    "PoolSaturated": (".executors", "PoolSaturated"),
+    "get_pool": (".executors", "get_pool"),
+    "REGISTRY": (".metrics", "REGISTRY"),
+    "timed": (".metrics", "timed"),
+    "DecimalEncoder": (".responses", "DecimalEncoder"),
+    "JSONResponse": (".responses", "JSONResponse"),
+    "StreamingJSONResponse": (".responses", "StreamingJSONResponse"),
+    "GraphQLApp": (".graphql", "CGraphQLApp"),
+    "WSGIMiddleware": ("starlette.middleware.wsgi", "WSGIMiddleware"),
+    "AuthenticationMiddleware": (
+        "starlette.middleware.authentication",
+        "AuthenticationMiddleware",
+    ),
+    "requires": ("starlette.authentication", "requires"),
+    "SentryMiddleware": ("sentry_asgi", "SentryMiddleware"),
+    "sentry_sdk": ("sentry_sdk", None),
+    "GraphqlBackend": (".backends", "GraphqlBackend"),
+    "TokenCache": (".backends", "TokenCache"),
+    "CompressionMiddleware": (".compression", "CompressionMiddleware"),
+    "DEFAULT_POLICY": (".cors", "DEFAULT_POLICY"),
+    "CachedCORSMiddleware": (".cors", "CachedCORSMiddleware"),
+    "DatabasePool": (".db", "DatabasePool"),
+    "BackpressureMiddleware": (".errors", "BackpressureMiddleware"),
+    "ErrorReporter": (".errors", "ErrorReporter"),
+    "MetricsMiddleware": (".metrics", "MetricsMiddleware"),
+    "PrefixDispatcher": (".routing", "PrefixDispatcher"),
+    "Warmup": (".warmup", "Warmup"),
+    "StreamingWSGIMiddleware": (".wsgi", "StreamingWSGIMiddleware"),
+}
+
+
+def __getattr__(name):
+    try:
+        module_name, attr = _LAZY_IMPORTS[name]
+    except KeyError:
+        raise AttributeError(
+            "module {!r} has no attribute {!r}".format(__name__, name)
+        )
+    value = importlib.import_module(module_name, __package__)
+    if attr is not None:
+        value = getattr(value, attr)
+    globals()[name] = value
+    return value
 
 
 def default_on_error(conn: HTTPConnection, exc: Exception) -> Response:
+    from .responses import JSONResponse
+
     return JSONResponse({"detail": str(exc)}, status_code=403)
 
 
 def create_asgi_app(**kwargs):
     sentry_settings = kwargs.pop("sentry_settings", None)
     auth_validation = kwargs.pop("auth_validation", None)
+    token_cache = kwargs.pop("token_cache", None)
+    auth_concurrency = kwargs.pop("auth_concurrency", None)
     protect = kwargs.pop("protect", None)
     schema = kwargs.pop("schema", None)
+    graphql_options = kwargs.pop("graphql_options", None) or {}
+    compression = kwargs.pop("compression", None)
+    metrics = kwargs.pop("metrics", None)
+    db_pool = kwargs.pop("db_pool", None)
+    on_startup = kwargs.pop("on_startup", None) or []
+    on_shutdown = kwargs.pop("on_shutdown", None) or []
+    warmup = kwargs.pop("warmup", None)
+    debug = kwargs.pop("debug", None)
+    error_reporter = kwargs.pop("error_reporter", None)
     print(kwargs)
-    app = Starlette(**kwargs)
+    from .errors import (
+        BackpressureMiddleware,
+        ErrorReporter,
+        debug_from_env,
+        pool_saturated_response,
+    )
+    from .executors import PoolSaturated
+    from .metrics import REGISTRY
+
+    if debug is None:
+        debug = debug_from_env()
+    app = Starlette(debug=debug, **kwargs)
+    # answered here, since Starlette's ServerErrorMiddleware would send its
+    # plain-text 500 before any router-level handler sees the exception
+    app.add_exception_handler(PoolSaturated, pool_saturated_response)
+    if not debug:
+        app.add_exception_handler(
+            Exception, error_reporter or ErrorReporter(sentry=bool(sentry_settings))
+        )
+    if db_pool:
+        from .db import DatabasePool
+
+        if not isinstance(db_pool, DatabasePool):
+            db_pool = DatabasePool(**({} if db_pool is True else db_pool))
+        DatabaseSyncToAsync.pool = db_pool
+        if metrics:
+            REGISTRY.track("db_pool", "default", db_pool)
     # app.add_middleware(
     #     CORSMiddleware, allow_methods=["*"], allow_origins=["*"], allow_headers=["*"]
     # )
     if auth_validation:
+        from starlette.middleware.authentication import AuthenticationMiddleware
+        from .backends import GraphqlBackend, TokenCache
+
+        # cached tokens survive bulk updates that bypass User.save() (e.g.
+        # QuerySet.update(is_active=False)) for up to the cache's ttl; see
+        # TokenCache and call revoke_user_tokens after such updates
+        if token_cache is True:
+            token_cache = TokenCache()
+        backend = GraphqlBackend(
+            auth_validation,
+            cache=token_cache or None,
+            concurrency=auth_concurrency,
+        )
         app.add_middleware(
-            AuthenticationMiddleware,
-            backend=GraphqlBackend(auth_validation),
-            on_error=default_on_error,
+            AuthenticationMiddleware, backend=backend, on_error=default_on_error
         )
+        if metrics:
+            REGISTRY.track("limiter", "auth", backend.limiter)
 
     # app.add_exception_handler(Exception, get_debug_response)
     if sentry_settings:
+        import sentry_sdk
+        from sentry_asgi import SentryMiddleware
+
         sentry_sdk.init(dsn=sentry_settings)
         app.add_middleware(SentryMiddleware)
+    # saturated executor pools answer 503 instead of queueing
+    app.add_middleware(BackpressureMiddleware)
+    if compression:
+        from .compression import CompressionMiddleware
+
+        app.add_middleware(
+            CompressionMiddleware, **({} if compression is True else compression)
+        )
     if schema:
         # if protect:
         #     app.add_route(
         #         "/graphql",
         #         requires('authenticated')(GraphQLApp(schema=schema)))
         # else:
-        app.add_route("/graphql", GraphQLApp(schema=schema))
+        from .graphql import CGraphQLApp as GraphQLApp
+
+        graphql_app = GraphQLApp(schema=schema, **graphql_options)
+        app.add_route("/graphql", graphql_app)
+        if metrics and graphql_options.get("cost_analyzer") is not None:
+            REGISTRY.track("query_cost", "graphql", graphql_options["cost_analyzer"])
+    for func in on_startup:
+        app.add_event_handler("startup", func)
+    for func in on_shutdown:
+        app.add_event_handler("shutdown", func)
+    if warmup:
+        from .warmup import Warmup, warm_django_settings
+
+        options = {} if warmup is True else dict(warmup)
+        readiness_path = options.pop("readiness_path", "/ready")
+        queries = options.pop("queries", ())
+        app.state.warmup = warm = Warmup(**options)
+        warm.add("settings", warm_django_settings)
+        if DatabaseSyncToAsync.pool is not None:
+            warm.add("db", DatabaseSyncToAsync.pool.warm)
+        if schema:
+            warm.add("graphql", functools.partial(graphql_app.warm, queries))
+        app.add_event_handler("startup", warm.startup)
+        app.add_event_handler("shutdown", warm.shutdown)
+        app.add_route(readiness_path, warm.readiness, include_in_schema=False)
+    if metrics:
+        from .metrics import MetricsMiddleware, metrics_endpoint
+
+        # outermost, so the latency includes auth and compression
+        app.add_middleware(MetricsMiddleware)
+        app.add_route(
+            "/metrics" if metrics is True else metrics,
+            metrics_endpoint,
+            include_in_schema=False,
+        )
     return app
 
 
-def create_app(application, wsgi=False):
+def create_app(application, wsgi=False, asgi=False, threads=10, name="wsgi"):
+    """
+    `asgi=True` serves Django's own WSGI handler (`get_wsgi_application()`,
+    or `None`) through Django's ASGI handler when this Django version has
+    one. Any other WSGI app, e.g. Django wrapped in WSGI middleware, is
+    served as given through `StreamingWSGIMiddleware` on a pool of
+    `threads` threads whose metrics are labelled `name`. `wsgi=True` keeps
+    Starlette's buffering `WSGIMiddleware`.
+    """
+    if asgi:
+        if application is None or is_django_wsgi_handler(application):
+            handler = get_django_asgi_application()
+            if handler is not None:
+                return handler
+        if application is None:
+            raise ValueError(
+                "create_app(None, asgi=True) needs Django 3.0+ for its ASGI handler"
+            )
+        from .wsgi import StreamingWSGIMiddleware
+
+        return StreamingWSGIMiddleware(application, workers=threads, name=name)
     if wsgi:
+        from starlette.middleware.wsgi import WSGIMiddleware
+
         return WSGIMiddleware(application)
     return application
 
-def initialize_router(asgi, wsgi=None, asgi_path="/",**kwargs):
-    apps = [{"path":asgi_path, 'app':asgi}]
+
+def is_django_wsgi_handler(application):
+    from django.core.handlers.wsgi import WSGIHandler
+
+    # subclasses may change the request handling, so only the exact class
+    return type(application) is WSGIHandler
+
+
+def get_django_asgi_application():
+    try:
+        from django.core.asgi import get_asgi_application
+    except ImportError:
+        return None
+    return get_asgi_application()
+
+def initialize_router(asgi, wsgi=None, asgi_path="/", asgi_cors=None, **kwargs):
+    apps = [{"path": asgi_path, "app": asgi, "cors": asgi_cors}]
     if wsgi:
         wsgi_instance = {**wsgi, 'wsgi':True}
         apps.append(wsgi_instance)
 
     return _initialize_router(apps, **kwargs)
-    
-def _initialize_router(apps, debug=True, sentry_settings=None):
-    app = Router(
-        [Mount(x["path"], app=create_app(x["app"], x.get("wsgi"))) for x in apps]
-    )
-    if debug:
-        app = ExceptionMiddleware(app, debug=True)
-        app.add_exception_handler(Exception, get_debug_response)
-    app = CORSMiddleware(
-        app, allow_methods=["*"], allow_origins=["*"], allow_headers=["*"]
-    )
+
+
+def _initialize_router(
+    apps,
+    debug=None,
+    sentry_settings=None,
+    routes_path=None,
+    cors=None,
+    compression=None,
+    error_reporter=None,
+):
+    """
+    `debug` defaults to the DEBUG environment variable. In debug mode
+    failures are answered with `get_debug_response`; otherwise with
+    `error_reporter` (an `ErrorReporter` by default), which returns a
+    compact JSON error and samples traceback logging. Starlette mounts
+    answer their own errors (`create_asgi_app` installs the same handlers)
+    and are not wrapped again.
+
+    `cors` is the default CORS policy (`CachedCORSMiddleware` kwargs) for
+    every mount; a mount's own "cors" entry replaces it, and `False`
+    disables CORS. Each mount is wrapped separately so preflights are
+    answered right after dispatch. `compression` is `True` or
+    `CompressionMiddleware` kwargs.
+    """
+    from .cors import DEFAULT_POLICY, CachedCORSMiddleware
+    from .errors import ErrorReporter, debug_from_env, pool_saturated_response
+    from .executors import PoolSaturated
+    from .routing import PrefixDispatcher
+
+    if debug is None:
+        debug = debug_from_env()
+    if sentry_settings:
+        import sentry_sdk
+
+        sentry_sdk.init(dsn=sentry_settings)
+    if not debug and error_reporter is None:
+        error_reporter = ErrorReporter(sentry=bool(sentry_settings))
+    if cors is None:
+        cors = DEFAULT_POLICY
+    mounts = []
+    for x in apps:
+        app = create_app(
+            x["app"],
+            x.get("wsgi"),
+            asgi=x.get("asgi"),
+            threads=x.get("threads", 10),
+            # one pool per mount, so label its metrics by mount path
+            name="wsgi:%s" % x["path"],
+        )
+        if not isinstance(app, Starlette):
+            app = ExceptionMiddleware(app, debug=debug)
+            app.add_exception_handler(
+                Exception, get_debug_response if debug else error_reporter
+            )
+            app.add_exception_handler(PoolSaturated, pool_saturated_response)
+        policy = x.get("cors")
+        if policy is None:
+            policy = cors
+        if policy:
+            app = CachedCORSMiddleware(app, **policy)
+        mounts.append((x["path"], app))
+    app = PrefixDispatcher(mounts, routes_path=routes_path)
+    if compression:
+        from .compression import CompressionMiddleware
+
+        app = CompressionMiddleware(app, **({} if compression is True else compression))
     return app
 
 
-class DatabaseSyncToAsync(SyncToAsync):
+class DatabaseSyncToAsync(object):
     """
-    SyncToAsync version that cleans up old database connections when it exits.
+    Runs a sync function on the "db" executor pool and cleans up old
+    database connections when it exits.
+
+    Raises `PoolSaturated` when the pool is full. When `pool` is set to a
+    `DatabasePool` (see `create_asgi_app(db_pool=...)`) connections are kept
+    open instead. Only `ExecutorPool.run` is used, not asgiref's private
+    `SyncToAsync` dispatch, which changes between asgiref releases.
     """
 
-    def thread_handler(self, loop, *args, **kwargs):
+    pool = None
+
+    def __init__(self, func, thread_sensitive=False):
+        self.func = func
+        functools.update_wrapper(self, func)
+
+    async def __call__(self, *args, **kwargs):
+        from .executors import get_pool
+
+        executor = get_pool("db") if self.pool is None else self.pool.executor
+        return await executor.run(self.run, *args, **kwargs)
+
+    def __get__(self, parent, objtype):
+        return functools.partial(self.__call__, parent)
+
+    def run(self, *args, **kwargs):
         from django.db import connections, close_old_connections
+        from .metrics import timed
 
+        pool = self.pool
+        if pool is not None:
+            pool.checkout()
         try:
-            return super().thread_handler(loop, *args, **kwargs)
+            with timed("db"):
+                return self.func(*args, **kwargs)
         finally:
-            close_old_connections()
-            connections.close_all()
+            if pool is not None:
+                pool.checkin()
+            else:
+                close_old_connections()
+                connections.close_all()
 
 
 # The class is TitleCased, but we want to encourage use as a callable/decorator
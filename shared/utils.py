@@ -1,4 +1,6 @@
+import base64
 import csv
+import json
 import os
 
 
@@ -30,3 +32,45 @@ def classproperty(func):
         func = classmethod(func)
 
     return ClassPropertyDescriptor(func)
+
+
+def unverified_jwt_claims(token):
+    """
+    Read the claims of a JWT without verifying its signature.
+
+    Only use the result for bookkeeping (cache keys, expiry hints); never to
+    make an authorization decision.
+    """
+    try:
+        segment = token.split(".")[1]
+        segment += "=" * (-len(segment) % 4)
+        claims = json.loads(base64.urlsafe_b64decode(segment.encode("ascii")))
+    except (IndexError, ValueError, UnicodeError):
+        return {}
+    if not isinstance(claims, dict):
+        return {}
+    return claims
+
+
+def negotiate_encoding(accept_encoding, available):
+    """
+    Pick the first of `available` (in order of preference) that the
+    `Accept-Encoding` header allows; "identity" when none match.
+    """
+    accepted = {}
+    for part in accept_encoding.lower().split(","):
+        coding, _, params = part.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        if coding:
+            accepted[coding] = quality
+    wildcard = accepted.get("*", 0.0)
+    for coding in available:
+        if accepted.get(coding, wildcard) > 0:
+            return coding
+    return "identity"
@@ -0,0 +1,92 @@
+import asyncio
+import logging
+import time
+
+from .backends import is_async_callable
+from .executors import run_in_pool
+from .responses import JSONResponse
+
+logger = logging.getLogger(__name__)
+
+
+def warm_django_settings():
+    """
+    Set up the Django app registry and resolve the JWT settings, when this
+    process is configured for Django.
+    """
+    try:
+        from django.conf import settings
+    except ImportError:
+        return
+    if not settings.configured:
+        return
+    from django.apps import apps
+
+    if not apps.ready:
+        import django
+
+        django.setup(set_prefix=False)
+    try:
+        from rest_framework_jwt.settings import api_settings
+    except ImportError:
+        return
+    for name in (
+        "JWT_SECRET_KEY",
+        "JWT_GET_USER_SECRET_KEY",
+        "JWT_ALGORITHM",
+        "JWT_VERIFY_EXPIRATION",
+        "JWT_PAYLOAD_HANDLER",
+        "JWT_ENCODE_HANDLER",
+        "JWT_DECODE_HANDLER",
+    ):
+        getattr(api_settings, name, None)
+
+
+class Warmup(object):
+    """
+    Runs warmup steps on startup, in the background by default, and tracks
+    readiness. Plain functions run on the "cpu" executor pool so the event
+    loop keeps serving while they work. A failing step is logged and
+    skipped; `readiness` answers 503 until every step has run.
+    """
+
+    def __init__(self, background=True):
+        self.background = background
+        self.steps = []
+        self.ready = False
+        self.timings = {}
+        self.failed = []
+        self._task = None
+
+    def add(self, name, func):
+        self.steps.append((name, func))
+
+    async def run(self):
+        for name, func in self.steps:
+            start = time.perf_counter()
+            try:
+                if is_async_callable(func):
+                    await func()
+                else:
+                    await run_in_pool("cpu", func)
+            except Exception:
+                logger.exception("Warmup step %r failed", name)
+                self.failed.append(name)
+            self.timings[name] = time.perf_counter() - start
+        self.ready = True
+
+    async def startup(self):
+        if self.background:
+            self._task = asyncio.ensure_future(self.run())
+        else:
+            await self.run()
+
+    async def shutdown(self):
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+
+    async def readiness(self, request):
+        return JSONResponse(
+            {"ready": self.ready, "timings": self.timings, "failed": self.failed},
+            status_code=200 if self.ready else 503,
+        )
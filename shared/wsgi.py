@@ -0,0 +1,168 @@
+import asyncio
+import sys
+import typing
+
+from .executors import ExecutorPool
+
+
+def build_environ(scope, stream) -> dict:
+    """
+    Builds a scope into a WSGI environ object whose `wsgi.input` is `stream`.
+    """
+    environ = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": scope.get("root_path", ""),
+        "PATH_INFO": scope["path"],
+        "QUERY_STRING": scope["query_string"].decode("ascii"),
+        "SERVER_PROTOCOL": f"HTTP/{scope['http_version']}",
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": stream,
+        "wsgi.errors": sys.stdout,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": True,
+        "wsgi.run_once": False,
+    }
+
+    # Get server name and port - required in WSGI, not in ASGI
+    server = scope.get("server") or ("localhost", 80)
+    environ["SERVER_NAME"] = server[0]
+    environ["SERVER_PORT"] = str(server[1])
+
+    # Get client IP address
+    if scope.get("client"):
+        environ["REMOTE_ADDR"] = scope["client"][0]
+
+    for name, value in scope.get("headers", []):
+        name = name.decode("latin1")
+        if name == "content-length":
+            corrected_name = "CONTENT_LENGTH"
+        elif name == "content-type":
+            corrected_name = "CONTENT_TYPE"
+        else:
+            corrected_name = f"HTTP_{name}".upper().replace("-", "_")
+        value = value.decode("latin1")
+        if corrected_name in environ:
+            value = environ[corrected_name] + "," + value
+        environ[corrected_name] = value
+    return environ
+
+
+class RequestStream(object):
+    """
+    File-like `wsgi.input` that pulls the request body from the ASGI
+    `receive` channel as the WSGI app reads it, instead of buffering the
+    whole body up front. Only used from the worker thread.
+    """
+
+    def __init__(self, receive, loop):
+        self.receive = receive
+        self.loop = loop
+        self.buffer = b""
+        self.more_body = True
+
+    def _fill(self, size=-1):
+        while self.more_body and (size < 0 or len(self.buffer) < size):
+            message = asyncio.run_coroutine_threadsafe(self.receive(), self.loop).result()
+            if message["type"] == "http.disconnect":
+                self.more_body = False
+                break
+            self.buffer += message.get("body", b"")
+            self.more_body = message.get("more_body", False)
+
+    def read(self, size=-1):
+        if size is None:
+            size = -1
+        self._fill(size)
+        if size < 0:
+            data, self.buffer = self.buffer, b""
+        else:
+            data, self.buffer = self.buffer[:size], self.buffer[size:]
+        return data
+
+    def readline(self, size=-1):
+        while b"\n" not in self.buffer and self.more_body:
+            self._fill(len(self.buffer) + 1)
+        end = self.buffer.find(b"\n") + 1 or len(self.buffer)
+        if size is not None and 0 <= size < end:
+            end = size
+        data, self.buffer = self.buffer[:end], self.buffer[end:]
+        return data
+
+    def readlines(self, hint=-1):
+        return list(iter(self.readline, b""))
+
+    def __iter__(self):
+        return iter(self.readline, b"")
+
+
+class StreamingWSGIMiddleware(object):
+    """
+    Serves a WSGI app from ASGI without buffering: the request body is read
+    on demand and each chunk the app yields is sent as soon as it is
+    produced. WSGI calls run on a dedicated pool of `workers` threads, which
+    raises `PoolSaturated` once `max_queue` requests are waiting. The pool's
+    metrics are labelled `name`; give each mount its own.
+    """
+
+    def __init__(
+        self,
+        app: typing.Callable,
+        workers: int = 10,
+        max_queue: int = 100,
+        name: str = "wsgi",
+    ) -> None:
+        self.app = app
+        self.executor = ExecutorPool(name, max_workers=workers, max_queue=max_queue)
+
+    async def __call__(self, scope, receive, send) -> None:
+        assert scope["type"] == "http"
+        loop = asyncio.get_event_loop()
+        await loop.run_in_executor(self.executor, self.run_wsgi, scope, receive, send, loop)
+
+    def run_wsgi(self, scope, receive, send, loop):
+        started = []
+        response = {}
+
+        def send_message(message):
+            asyncio.run_coroutine_threadsafe(send(message), loop).result()
+
+        def start():
+            if not started:
+                started.append(True)
+                send_message(
+                    {
+                        "type": "http.response.start",
+                        "status": response["status"],
+                        "headers": response["headers"],
+                    }
+                )
+
+        def write(data):
+            start()
+            if data:
+                send_message(
+                    {"type": "http.response.body", "body": data, "more_body": True}
+                )
+
+        def start_response(status, response_headers, exc_info=None):
+            if exc_info is not None and started:
+                raise exc_info[1].with_traceback(exc_info[2])
+            response["status"] = int(status.split(" ", 1)[0])
+            response["headers"] = [
+                (name.strip().encode("latin1").lower(), value.strip().encode("latin1"))
+                for name, value in response_headers
+            ]
+            return write
+
+        environ = build_environ(scope, RequestStream(receive, loop))
+        iterable = self.app(environ, start_response)
+        try:
+            for chunk in iterable:
+                if chunk:
+                    write(chunk)
+            start()
+            send_message({"type": "http.response.body", "body": b"", "more_body": False})
+        finally:
+            if hasattr(iterable, "close"):
+                iterable.close()
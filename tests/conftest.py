@@ -0,0 +1,25 @@
+import os
+import tempfile
+
+import django
+from django.conf import settings
+
+
+def pytest_configure():
+    if not settings.configured:
+        settings.configure(
+            DATABASES={
+                "default": {
+                    "ENGINE": "django.db.backends.sqlite3",
+                    "NAME": os.path.join(tempfile.mkdtemp(), "db.sqlite3"),
+                }
+            },
+            INSTALLED_APPS=["django.contrib.contenttypes", "django.contrib.auth"],
+            SECRET_KEY="tests",
+            USE_TZ=True,
+            JWT_AUTH={
+                "JWT_AUTH_HEADER_PREFIX": "Token",
+                "JWT_GET_USER_SECRET_KEY": lambda user: user.password_hash + "tests",
+            },
+        )
+        django.setup()
@@ -0,0 +1,92 @@
+import base64
+import json
+
+import pytest
+
+try:
+    from shared.contrib.auth.models import AbstractUser, get_user_secret_key
+except (ImportError, AttributeError):
+    # djangorestframework 3.7 does not import on Python 3.10+
+    pytest.skip("djangorestframework-jwt is not importable", allow_module_level=True)
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework_jwt import utils
+
+
+class TokenUser(AbstractUser):
+    class Meta:
+        app_label = "auth"
+
+
+@pytest.fixture(scope="module")
+def users():
+    with connection.schema_editor() as editor:
+        editor.create_model(TokenUser)
+    users = [
+        TokenUser.objects.create(username="user%d" % i, email="user%d@example.com" % i)
+        for i in range(3)
+    ]
+    yield users
+    with connection.schema_editor() as editor:
+        editor.delete_model(TokenUser)
+
+
+def forge(claims):
+    segment = base64.urlsafe_b64encode(json.dumps(claims).encode()).rstrip(b"=")
+    return "e30.%s.signature" % segment.decode()
+
+
+@pytest.fixture(params=["user_secret_key", "shared_secret_key"])
+def secret_key_mode(request, monkeypatch):
+    if request.param == "shared_secret_key":
+        monkeypatch.setattr(utils.api_settings, "JWT_GET_USER_SECRET_KEY", None)
+    return request.param
+
+
+def test_validate_tokens(users, secret_key_mode):
+    tokens = [user.get_new_token() for user in users]
+    bad = [
+        forge({"user_id": "abc", "username": ["user0"]}),
+        forge({"user_id": [1], "username": {"a": 1}}),
+        "junk",
+    ]
+    results = TokenUser.validate_tokens(tokens[:2] + bad + tokens[2:])
+    assert [result["token"] for result in results] == tokens[:2] + bad + tokens[2:]
+    assert [result.get("user") for result in results] == (
+        users[:2] + [None] * len(bad) + users[2:]
+    )
+    assert all(result["error"] for result in results[2:5])
+
+
+def test_user_secret_key_is_cached_per_password(users, monkeypatch):
+    calls = []
+
+    def secret_key(user):
+        calls.append(user.pk)
+        return user.password_hash + "tests"
+
+    monkeypatch.setattr(utils.api_settings, "JWT_GET_USER_SECRET_KEY", secret_key)
+    user = TokenUser(pk=1000, username="cached", password="first")
+    assert get_user_secret_key(user) == get_user_secret_key(user)
+    assert calls == [1000]
+    user.password = "second"
+    assert get_user_secret_key(user) == "secondtests"
+    assert calls == [1000, 1000]
+
+
+def test_validate_token_loads_the_user_once(users):
+    token = users[0].get_new_token()
+    with CaptureQueriesContext(connection) as queries:
+        result = TokenUser.validate_token(token)
+    assert result["user"] == users[0]
+    assert len(queries) == 1
+
+
+def test_password_change_rejects_old_tokens(users):
+    user = TokenUser.objects.create(username="changer", email="changer@example.com")
+    token = user.get_new_token()
+    assert TokenUser.validate_token(token)["user"] == user
+    user.set_password("new password")
+    user.save()
+    assert "error" in TokenUser.validate_tokens([token])[0]
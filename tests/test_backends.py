@@ -0,0 +1,104 @@
+import asyncio
+import base64
+import json
+import threading
+import time
+
+import pytest
+from starlette.authentication import AuthenticationError
+from starlette.requests import Request
+
+from shared.backends import (
+    GraphqlBackend, TokenCache, ValidationError, revoke_user_tokens)
+
+
+def run(coroutine):
+    return asyncio.get_event_loop().run_until_complete(coroutine)
+
+
+def request(token):
+    headers = [(b"authorization", ("Token " + token).encode())]
+    return Request({"type": "http", "headers": headers})
+
+
+def forge(claims):
+    segment = base64.urlsafe_b64encode(json.dumps(claims).encode()).rstrip(b"=")
+    return "e30.%s.signature" % segment.decode()
+
+
+def test_token_cache_default_ttl_is_short():
+    assert TokenCache().ttl <= 60
+
+
+def test_token_cache_revoke_user_tokens():
+    cache = TokenCache()
+    first = forge({"user_id": 1, "exp": time.time() + 3600})
+    second = forge({"user_id": 2, "exp": time.time() + 3600})
+    cache.set(first, "one")
+    cache.set(second, "two")
+    # bulk updates skip User.save(), so callers revoke explicitly
+    revoke_user_tokens(1)
+    assert cache.get(first) is None
+    assert cache.get(second) == "two"
+
+
+def test_token_cache_respects_exp():
+    cache = TokenCache(ttl=None)
+    expired = forge({"user_id": 1, "exp": time.time() - 1})
+    cache.set(expired, "one")
+    assert cache.get(expired) is None
+
+
+def test_sync_validator_runs_off_the_event_loop():
+    threads = []
+
+    def validate(token):
+        threads.append(threading.get_ident())
+        if token == "bad":
+            raise ValidationError(token)
+        return token.upper()
+
+    backend = GraphqlBackend(validate)
+    credentials, user = run(backend.authenticate(request("abc")))
+    assert credentials.scopes == ["authenticated"]
+    assert user.username == "ABC"
+    assert threads and threads[0] != threading.get_ident()
+    with pytest.raises(AuthenticationError):
+        run(backend.authenticate(request("bad")))
+
+
+def test_async_validator_runs_on_the_event_loop():
+    threads = []
+
+    async def validate(token):
+        threads.append(threading.get_ident())
+        return token
+
+    backend = GraphqlBackend(validate)
+    run(backend.authenticate(request("abc")))
+    assert threads == [threading.get_ident()]
+
+
+def test_validations_are_capped_by_concurrency():
+    peak = []
+    running = []
+    lock = threading.Lock()
+
+    def validate(token):
+        with lock:
+            running.append(token)
+            peak.append(len(running))
+        time.sleep(0.02)
+        with lock:
+            running.remove(token)
+        return token
+
+    backend = GraphqlBackend(validate, concurrency=2)
+
+    async def many():
+        return await asyncio.gather(
+            *[backend.authenticate(request("t%d" % i)) for i in range(6)])
+
+    assert len(run(many())) == 6
+    assert max(peak) == 2
+    assert backend.limiter.stats["calls"] == 6
@@ -0,0 +1,85 @@
+import asyncio
+import gzip
+
+from starlette.responses import Response, StreamingResponse
+
+from shared.compression import CompressionMiddleware
+
+
+def run(coroutine):
+    return asyncio.get_event_loop().run_until_complete(coroutine)
+
+
+def call(app, accept_encoding="gzip"):
+    messages = []
+    requests = [{"type": "http.request", "body": b""}]
+
+    async def receive():
+        if requests:
+            return requests.pop()
+        await asyncio.sleep(3600)
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {
+        "type": "http",
+        "method": "GET",
+        "path": "/",
+        "headers": [(b"accept-encoding", accept_encoding.encode())],
+    }
+    run(app(scope, receive, send))
+    headers = dict(messages[0]["headers"])
+    body = b"".join(message.get("body", b"") for message in messages[1:])
+    return headers, body
+
+
+def responding(body, media_type="text/plain", headers=None):
+    return Response(body, media_type=media_type, headers=headers)
+
+
+def test_compresses_bodies_at_the_threshold():
+    body = b"a" * 500
+    headers, compressed = call(CompressionMiddleware(responding(body), encodings=("gzip",)))
+    assert headers[b"content-encoding"] == b"gzip"
+    assert headers[b"vary"] == b"Accept-Encoding"
+    assert headers[b"content-length"] == str(len(compressed)).encode()
+    assert gzip.decompress(compressed) == body
+
+
+def test_small_bodies_pass_through():
+    body = b"a" * 499
+    headers, sent = call(CompressionMiddleware(responding(body)))
+    assert b"content-encoding" not in headers
+    assert sent == body
+
+
+def test_skips_compressed_media_and_encoded_bodies():
+    body = b"a" * 1000
+    for app in (
+        responding(body, media_type="image/png"),
+        responding(body, media_type="application/octet-stream"),
+        responding(body, headers={"Content-Encoding": "identity"}),
+    ):
+        headers, sent = call(CompressionMiddleware(app))
+        assert headers.get(b"content-encoding", b"identity") == b"identity"
+        assert sent == body
+
+
+def test_skips_streaming_and_unaccepted_responses():
+    async def chunks():
+        yield b"a" * 1000
+        yield b"b" * 1000
+
+    headers, sent = call(CompressionMiddleware(StreamingResponse(chunks())))
+    assert b"content-encoding" not in headers
+    assert sent == b"a" * 1000 + b"b" * 1000
+    headers, sent = call(CompressionMiddleware(responding(b"a" * 1000)), "identity")
+    assert b"content-encoding" not in headers
+
+
+def test_large_bodies_are_compressed_on_the_cpu_pool():
+    body = b"a" * 2048
+    app = CompressionMiddleware(responding(body), encodings=("gzip",), offload_size=1024)
+    headers, compressed = call(app)
+    assert gzip.decompress(compressed) == body
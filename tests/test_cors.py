@@ -0,0 +1,73 @@
+from starlette.responses import PlainTextResponse
+from starlette.testclient import TestClient
+
+from shared.cors import CachedCORSMiddleware
+from shared.starlette import _initialize_router
+
+
+async def hello(scope, receive, send):
+    await PlainTextResponse("hello")(scope, receive, send)
+
+
+PREFLIGHT = {
+    "Origin": "https://example.com",
+    "Access-Control-Request-Method": "POST",
+    "Access-Control-Request-Headers": "content-type",
+}
+
+
+def test_preflight_answers_are_cached():
+    app = CachedCORSMiddleware(hello, allow_origins=["https://example.com"],
+                               allow_methods=["POST"], allow_headers=["content-type"])
+    calls = []
+    build = app.preflight_response
+
+    def preflight_response(request_headers):
+        calls.append(request_headers["origin"])
+        return build(request_headers=request_headers)
+
+    app.preflight_response = preflight_response
+    client = TestClient(app)
+    first = client.options("/", headers=PREFLIGHT)
+    second = client.options("/", headers=PREFLIGHT)
+    assert first.status_code == second.status_code == 200
+    assert first.headers == second.headers
+    assert second.headers["access-control-allow-origin"] == "https://example.com"
+    assert calls == ["https://example.com"]
+    client.options("/", headers={**PREFLIGHT, "Access-Control-Request-Method": "PUT"})
+    assert len(calls) == 2
+
+
+def test_simple_responses_get_cors_headers():
+    app = CachedCORSMiddleware(hello, allow_origins=["https://example.com"])
+    client = TestClient(app)
+    response = client.get("/", headers={"Origin": "https://example.com"})
+    assert response.text == "hello"
+    assert response.headers["access-control-allow-origin"] == "https://example.com"
+    assert response.headers["vary"] == "Origin"
+    other = client.get("/", headers={"Origin": "https://other.com"})
+    assert "access-control-allow-origin" not in other.headers
+
+
+def test_each_mount_has_its_own_policy():
+    app = _initialize_router(
+        [
+            {"path": "/open", "app": hello},
+            {"path": "/closed", "app": hello, "cors": False},
+            {"path": "/partner", "app": hello,
+             "cors": {"allow_origins": ["https://partner.com"], "max_age": 60}},
+        ],
+        debug=True,
+    )
+    client = TestClient(app)
+    origin = {"Origin": "https://partner.com"}
+    assert client.get("/open/", headers=origin).headers[
+        "access-control-allow-origin"] == "*"
+    assert "access-control-allow-origin" not in client.get(
+        "/closed/", headers=origin).headers
+    preflight = client.options("/partner/", headers={
+        **origin, "Access-Control-Request-Method": "GET"})
+    assert preflight.headers["access-control-allow-origin"] == "https://partner.com"
+    assert preflight.headers["access-control-max-age"] == "60"
+    assert "access-control-allow-origin" not in client.get(
+        "/partner/", headers={"Origin": "https://example.com"}).headers
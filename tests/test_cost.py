@@ -0,0 +1,71 @@
+import time
+
+import graphene
+import pytest
+from graphql import parse
+
+from shared.cost import QueryCostAnalyzer, QueryCostError
+
+
+class Node(graphene.ObjectType):
+    value = graphene.Int()
+    child = graphene.Field(lambda: Node)
+    children = graphene.List(lambda: Node, first=graphene.Int())
+
+
+class Query(graphene.ObjectType):
+    node = graphene.Field(Node)
+
+
+schema = graphene.Schema(query=Query)
+
+
+def doubling_fragments(levels):
+    fragments = ["fragment F0 on Node { value }"]
+    for i in range(1, levels + 1):
+        fragments.append(
+            "fragment F%d on Node { a: child { ...F%d } b: child { ...F%d } }"
+            % (i, i - 1, i - 1)
+        )
+    return parse("{ node { ...F%d } }\n%s" % (levels, "\n".join(fragments)))
+
+
+def test_costs_lists_and_fields():
+    analyzer = QueryCostAnalyzer(field_costs={"Node.children": 2})
+    document = parse("{ node { value children(first: 5) { value child { value } } } }")
+    # node 1 + value 1 + children (2 + 5 * (value 1 + child 1 + value 1))
+    assert analyzer.analyze(schema, document) == (19, 4)
+
+
+def test_nested_fragment_spreads_are_walked_once():
+    document = doubling_fragments(20)
+    start = time.monotonic()
+    cost, depth = QueryCostAnalyzer().analyze(schema, document)
+    assert time.monotonic() - start < 1
+    # F0 costs 1 and Fi costs 2 * (1 + F(i-1))
+    expected = 1
+    for _ in range(20):
+        expected = 2 * (1 + expected)
+    assert (cost, depth) == (1 + expected, 22)
+
+
+def test_walk_stops_over_budget():
+    analyzer = QueryCostAnalyzer(max_cost=100)
+    with pytest.raises(QueryCostError) as error:
+        analyzer.check(schema, doubling_fragments(200))
+    assert error.value.cost > 100
+    assert analyzer.stats["rejected"] == 1
+
+    analyzer = QueryCostAnalyzer(max_depth=5)
+    with pytest.raises(QueryCostError) as error:
+        analyzer.check(schema, doubling_fragments(200))
+    assert error.value.depth == 6
+
+
+def test_empty_lists_do_not_stop_the_walk():
+    analyzer = QueryCostAnalyzer(max_cost=10)
+    document = parse(
+        "{ node { children(first: 0) { a: child { value } b: child { value }"
+        " c: child { value } d: child { value } e: child { value } f: child { value } } } }"
+    )
+    assert analyzer.check(schema, document) == (2, 4)
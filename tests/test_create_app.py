@@ -0,0 +1,52 @@
+import django
+import pytest
+from django.core.wsgi import get_wsgi_application
+from starlette.testclient import TestClient
+
+from shared.starlette import create_app
+from shared.wsgi import StreamingWSGIMiddleware
+
+
+def custom_app(environ, start_response):
+    start_response("200 OK", [("Content-Type", "text/plain")])
+    return [b"custom"]
+
+
+def test_asgi_keeps_a_custom_wsgi_app():
+    app = create_app(custom_app, asgi=True)
+    assert isinstance(app, StreamingWSGIMiddleware)
+    assert TestClient(app).get("/").text == "custom"
+
+
+@pytest.mark.skipif(django.VERSION < (3, 0), reason="Django 3.0+ has an ASGI handler")
+def test_asgi_uses_the_django_asgi_handler():
+    from django.core.handlers.asgi import ASGIHandler
+
+    assert isinstance(create_app(get_wsgi_application(), asgi=True), ASGIHandler)
+    assert isinstance(create_app(None, asgi=True), ASGIHandler)
+
+
+@pytest.mark.skipif(django.VERSION >= (3, 0), reason="Django < 3.0 has no ASGI handler")
+def test_asgi_streams_django_without_an_asgi_handler():
+    app = create_app(get_wsgi_application(), asgi=True)
+    assert isinstance(app, StreamingWSGIMiddleware)
+    with pytest.raises(ValueError):
+        create_app(None, asgi=True)
+
+
+def test_wsgi_mounts_get_their_own_pool_label():
+    from shared.metrics import REGISTRY
+    from shared.starlette import _initialize_router
+
+    app = _initialize_router(
+        [
+            {"path": "/one", "app": custom_app, "asgi": True},
+            {"path": "/two", "app": custom_app, "asgi": True},
+        ],
+        debug=True,
+    )
+    client = TestClient(app)
+    assert client.get("/one/").text == "custom"
+    rendered = REGISTRY.render()
+    assert 'executor_max_workers{name="wsgi:/one"}' in rendered
+    assert 'executor_max_workers{name="wsgi:/two"}' in rendered
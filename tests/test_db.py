@@ -0,0 +1,114 @@
+import asyncio
+import threading
+
+import asgiref
+import pytest
+
+from shared.executors import ExecutorPool, PoolSaturated, configure_pool
+from shared.starlette import DatabaseSyncToAsync, database_sync_to_async
+
+
+def run(coroutine):
+    return asyncio.get_event_loop().run_until_complete(coroutine)
+
+
+def test_runs_in_a_worker_thread():
+    main = threading.get_ident()
+
+    def query(value, offset=0):
+        return threading.get_ident(), value + offset
+
+    wrapped = database_sync_to_async(query)
+    assert wrapped.__name__ == "query"
+    ident, value = run(wrapped(1, offset=2))
+    assert value == 3
+    assert ident != main, asgiref.__version__
+
+
+def test_exceptions_propagate():
+    def fail():
+        raise ValueError("boom")
+
+    with pytest.raises(ValueError):
+        run(database_sync_to_async(fail)())
+
+
+def test_closes_connections():
+    from django.db import connection, connections
+
+    seen = []
+
+    def query():
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1")
+        seen.append(connections["default"])
+
+    run(database_sync_to_async(query)())
+    assert seen[0].connection is None
+
+
+def test_wraps_methods():
+    class Loader(object):
+        value = 4
+
+        @database_sync_to_async
+        def fetch(self, extra):
+            return self.value + extra
+
+    assert run(Loader().fetch(1)) == 5
+
+
+def test_saturated_pool(monkeypatch):
+    release = threading.Event()
+    executor = ExecutorPool("test-db", max_workers=1, max_queue=0)
+
+    class Pool(object):
+        def checkout(self):
+            pass
+
+        def checkin(self):
+            pass
+
+    pool = Pool()
+    pool.executor = executor
+    monkeypatch.setattr(DatabaseSyncToAsync, "pool", pool)
+
+    async def saturate():
+        first = asyncio.ensure_future(database_sync_to_async(release.wait)())
+        await asyncio.sleep(0.05)
+        try:
+            with pytest.raises(PoolSaturated):
+                await database_sync_to_async(release.wait)()
+        finally:
+            release.set()
+        return await first
+
+    try:
+        assert run(saturate()) is True
+    finally:
+        executor.shutdown()
+
+
+def test_database_pool_keeps_connections(monkeypatch):
+    from django.db import connection, connections
+
+    from shared.db import DatabasePool
+
+    monkeypatch.setitem(connections.databases["default"], "CONN_MAX_AGE", 60)
+    pool = DatabasePool(max_threads=1)
+    monkeypatch.setattr(DatabaseSyncToAsync, "pool", pool)
+
+    def query():
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1")
+        return id(connection.connection)
+
+    try:
+        first = run(database_sync_to_async(query)())
+        second = run(database_sync_to_async(query)())
+    finally:
+        configure_pool("db")
+    assert first == second
+    assert pool.stats["opened"] == 1
+    assert pool.stats["reused"] == 1
+    assert pool.stats["calls"] == 2
@@ -0,0 +1,66 @@
+import pytest
+from starlette.responses import PlainTextResponse
+from starlette.testclient import TestClient
+
+from shared.executors import PoolSaturated
+from shared.starlette import _initialize_router, create_asgi_app
+
+
+async def raw_app(scope, receive, send):
+    if scope["path"] == "/boom":
+        raise RuntimeError("boom")
+    if scope["path"] == "/busy":
+        raise PoolSaturated("db", retry_after=3)
+    await PlainTextResponse("ok")(scope, receive, send)
+
+
+def make_starlette_app():
+    app = create_asgi_app(debug=False)
+
+    @app.route("/boom")
+    async def boom(request):
+        raise RuntimeError("boom")
+
+    @app.route("/busy")
+    async def busy(request):
+        raise PoolSaturated("db", retry_after=3)
+
+    return app
+
+
+def make_client():
+    router = _initialize_router(
+        [
+            {"path": "/api", "app": make_starlette_app()},
+            {"path": "/", "app": raw_app},
+        ],
+        debug=False,
+        cors=False,
+    )
+    return TestClient(router, raise_server_exceptions=False)
+
+
+def test_errors_are_reported_as_json():
+    client = make_client()
+    for path in ("/api/boom", "/boom"):
+        response = client.get(path)
+        assert response.status_code == 500
+        body = response.json()
+        assert body["detail"] == "Internal Server Error"
+        assert response.headers["x-error-id"] == body["error_id"]
+
+
+def test_saturated_pools_answer_503():
+    client = make_client()
+    for path in ("/api/busy", "/busy"):
+        response = client.get(path)
+        assert response.status_code == 503
+        assert response.headers["retry-after"] == "3"
+        assert response.json()["pool"] == "db"
+
+
+def test_starlette_errors_reach_the_server():
+    # logged by the server once, not turned into "response already started"
+    client = TestClient(make_client().app)
+    with pytest.raises(RuntimeError, match="^boom$"):
+        client.get("/api/boom")
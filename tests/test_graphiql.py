@@ -0,0 +1,63 @@
+from starlette.applications import Starlette
+from starlette.testclient import TestClient
+
+from shared.graphiql import GraphiQLPage
+
+
+def make_client(static_dir):
+    page = GraphiQLPage(static_dir=str(static_dir))
+    app = Starlette()
+
+    @app.route("/graphql")
+    async def graphiql(request):
+        name = request.query_params.get("graphiql_asset")
+        if name is not None:
+            return page.asset_response(request, name)
+        return page.page_response(request)
+
+    return TestClient(app)
+
+
+def test_missing_assets_come_from_the_cdn(tmp_path):
+    response = make_client(tmp_path).get("/graphql")
+    assert response.status_code == 200
+    assert "//cdn.jsdelivr.net/npm/graphiql@0.12.0/graphiql.min.js" in response.text
+    assert "graphiql_asset=" not in response.text
+
+
+def test_vendored_assets_are_served(tmp_path):
+    (tmp_path / "graphiql.min.js").write_bytes(b"window.GraphiQL = 1;")
+    client = make_client(tmp_path)
+    page = client.get("/graphql")
+    assert "graphiql_asset=graphiql.min.js" in page.text
+    assert "//cdn.jsdelivr.net/npm/graphiql@0.12.0/graphiql.css" in page.text
+
+    response = client.get("/graphql?graphiql_asset=graphiql.min.js")
+    assert response.content == b"window.GraphiQL = 1;"
+    assert "immutable" in response.headers["cache-control"]
+    etag = response.headers["etag"]
+    cached = client.get(
+        "/graphql?graphiql_asset=graphiql.min.js", headers={"If-None-Match": etag}
+    )
+    assert cached.status_code == 304
+    assert client.get("/graphql?graphiql_asset=react.js").status_code == 404
+
+
+def test_each_encoding_has_its_own_etag(tmp_path):
+    (tmp_path / "graphiql.css").write_bytes(b"body { margin: 0 }" * 50)
+    client = make_client(tmp_path)
+    url = "/graphql?graphiql_asset=graphiql.css"
+    identity = client.get(url, headers={"Accept-Encoding": "identity"})
+    gzipped = client.get(url, headers={"Accept-Encoding": "gzip"})
+    assert gzipped.headers["content-encoding"] == "gzip"
+    assert identity.headers["vary"] == gzipped.headers["vary"] == "Accept-Encoding"
+    assert identity.headers["etag"] != gzipped.headers["etag"]
+    assert gzipped.headers["etag"].endswith('-gzip"')
+
+    def revalidate(encoding, etag):
+        headers = {"Accept-Encoding": encoding, "If-None-Match": etag}
+        return client.get(url, headers=headers).status_code
+
+    assert revalidate("gzip", gzipped.headers["etag"]) == 304
+    assert revalidate("identity", gzipped.headers["etag"]) == 200
+    assert revalidate("gzip", 'W/"x", ' + gzipped.headers["etag"]) == 304
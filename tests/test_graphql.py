@@ -0,0 +1,34 @@
+import graphene
+from starlette.testclient import TestClient
+
+from shared.cost import QueryCostAnalyzer
+from shared.starlette import create_asgi_app
+
+
+class Query(graphene.ObjectType):
+    hello = graphene.String(name=graphene.String(default_value="world"))
+
+    def resolve_hello(self, info, name):
+        return "Hello %s" % name
+
+
+schema = graphene.Schema(query=Query)
+
+
+def make_client(**graphql_options):
+    app = create_asgi_app(schema=schema, graphql_options=graphql_options)
+    return TestClient(app)
+
+
+def test_executes_queries():
+    response = make_client().post("/graphql", json={"query": '{ hello(name: "you") }'})
+    assert response.status_code == 200
+    assert response.json()["data"] == {"hello": "Hello you"}
+
+
+def test_rejects_queries_over_budget():
+    client = make_client(cost_analyzer=QueryCostAnalyzer(max_cost=1))
+    assert client.post("/graphql", json={"query": "{ hello }"}).status_code == 200
+    response = client.post("/graphql", json={"query": "{ a: hello b: hello }"})
+    assert response.status_code == 400
+    assert response.json()["errors"][0]["extensions"]["code"] == "QUERY_TOO_COMPLEX"
@@ -0,0 +1,59 @@
+import asyncio
+
+from shared.jobs import JobQueue, SQLiteJobStore
+
+
+def run(coroutine):
+    return asyncio.get_event_loop().run_until_complete(coroutine)
+
+
+def make_queue(**kwargs):
+    return JobQueue(SQLiteJobStore(":memory:"), backoff=0, name="test", **kwargs)
+
+
+def test_runs_sync_handlers_once_per_key():
+    queue = make_queue()
+    calls = []
+    queue.register("record", lambda value: calls.append(value))
+
+    assert run(queue.enqueue("record", "a", {"value": 1})) is True
+    assert run(queue.enqueue("record", "a", {"value": 1})) is False
+    assert run(queue.run_once()) is True
+    assert run(queue.run_once()) is False
+    assert calls == [1]
+    assert queue.stats["processed"] == 1
+
+
+def test_retries_then_buries():
+    queue = make_queue(max_attempts=2)
+    calls = []
+
+    def fail():
+        calls.append(1)
+        raise ValueError("boom")
+
+    queue.register("fail", fail)
+    run(queue.enqueue("fail", "a"))
+    while run(queue.run_once()):
+        pass
+    assert len(calls) == 2
+    assert queue.stats["retried"] == 1
+    [dead] = queue.store.dead_letters()
+    assert dead["error"] == "ValueError: boom"
+
+
+def test_handler_max_attempts():
+    queue = make_queue()
+    calls = []
+
+    @queue.register("notify", max_attempts=1)
+    async def notify():
+        calls.append(1)
+        raise ValueError("receiver failed")
+
+    run(queue.enqueue("notify", "a"))
+    while run(queue.run_once()):
+        pass
+    assert len(calls) == 1
+    assert queue.stats["dead"] == 1
+    assert len(queue.store.dead_letters()) == 1
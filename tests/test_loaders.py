@@ -0,0 +1,101 @@
+import asyncio
+
+import graphene
+from graphql.execution.executors.asyncio import AsyncioExecutor
+from starlette.testclient import TestClient
+
+from shared.loaders import DataLoader, LoaderRegistry
+from shared.starlette import create_asgi_app
+
+
+def run(coroutine):
+    return asyncio.get_event_loop().run_until_complete(coroutine)
+
+
+class Recorder(DataLoader):
+    def __init__(self):
+        super().__init__()
+        self.batches = []
+
+    async def batch_load(self, keys):
+        self.batches.append(keys)
+        return [ValueError(key) if key < 0 else key * 10 for key in keys]
+
+
+def test_loads_in_one_tick_share_a_batch():
+    loader = Recorder()
+
+    async def load():
+        return await asyncio.gather(
+            loader.load(1), loader.load(2), loader.load(1), loader.load(3))
+
+    assert run(load()) == [10, 20, 10, 30]
+    assert loader.batches == [[1, 2, 3]]
+    # results are cached for the life of the loader
+    assert run(loader.load_many([2, 4])) == [20, 40]
+    assert loader.batches == [[1, 2, 3], [4]]
+
+
+def test_an_exception_value_fails_only_its_key():
+    loader = Recorder()
+
+    async def load():
+        return await asyncio.gather(loader.load(1), loader.load(-1), return_exceptions=True)
+
+    value, error = run(load())
+    assert value == 10
+    assert isinstance(error, ValueError)
+    # failed keys are not cached
+    run(asyncio.gather(loader.load(-1), return_exceptions=True))
+    assert loader.batches == [[1, -1], [-1]]
+
+
+def test_registry_creates_loaders_lazily_per_registry():
+    created = []
+
+    def factory():
+        created.append(Recorder())
+        return created[-1]
+
+    first = LoaderRegistry({"numbers": factory})
+    second = LoaderRegistry({"numbers": factory})
+    assert created == []
+    assert first.numbers is first.get("numbers")
+    assert second.numbers is not first.numbers
+    assert len(created) == 2
+
+
+loaders = []
+
+
+def numbers():
+    loaders.append(Recorder())
+    return loaders[-1]
+
+
+class Query(graphene.ObjectType):
+    number = graphene.Int(key=graphene.Int())
+
+    async def resolve_number(self, info, key):
+        return await info.context["loaders"].numbers.load(key)
+
+
+schema = graphene.Schema(query=Query)
+
+
+def test_each_request_gets_its_own_loaders():
+    del loaders[:]
+    app = create_asgi_app(
+        schema=schema,
+        graphql_options={
+            "executor_class": AsyncioExecutor,
+            "loaders": {"numbers": numbers},
+        },
+    )
+    client = TestClient(app)
+    query = "{ a: number(key: 1) b: number(key: 2) c: number(key: 1) }"
+    for _ in range(2):
+        response = client.post("/graphql", json={"query": query})
+        assert response.json()["data"] == {"a": 10, "b": 20, "c": 10}
+    assert len(loaders) == 2
+    assert [loader.batches for loader in loaders] == [[[1, 2]], [[1, 2]]]
@@ -0,0 +1,69 @@
+from starlette.responses import PlainTextResponse
+from starlette.testclient import TestClient
+
+from shared.metrics import Registry
+from shared.starlette import create_asgi_app
+
+
+class Source(object):
+    stats = {"pending": 2, "ratio": 0.5, "enabled": True, "name": "pool"}
+
+
+def test_render_counters_and_histograms():
+    registry = Registry()
+    counter = registry.counter("jobs_total", "Jobs run.", ("queue",))
+    histogram = registry.histogram("job_seconds", "Job time.", buckets=(0.1, 1.0))
+    counter.inc('say "hi"\n')
+    counter.inc('say "hi"\n', amount=2)
+    histogram.observe(0.05)
+    histogram.observe(0.5)
+    histogram.observe(5)
+    assert registry.render().splitlines() == [
+        "# HELP jobs_total Jobs run.",
+        "# TYPE jobs_total counter",
+        'jobs_total{queue="say \\"hi\\"\\n"} 3',
+        "# HELP job_seconds Job time.",
+        "# TYPE job_seconds histogram",
+        'job_seconds_bucket{le="0.1"} 1',
+        'job_seconds_bucket{le="1.0"} 2',
+        'job_seconds_bucket{le="+Inf"} 3',
+        "job_seconds_sum 5.55",
+        "job_seconds_count 3",
+    ]
+
+
+def test_tracked_sources_render_numeric_stats_as_gauges():
+    registry = Registry()
+    source = Source()
+    registry.track("executor", "db", source)
+    assert registry.render().splitlines() == [
+        "# TYPE executor_pending gauge",
+        'executor_pending{name="db"} 2',
+        "# TYPE executor_ratio gauge",
+        'executor_ratio{name="db"} 0.5',
+    ]
+    del source
+    assert registry.render() == "\n"
+
+
+def hello(request):
+    return PlainTextResponse("hello")
+
+
+def test_metrics_endpoint_counts_requests_by_route():
+    app = create_asgi_app(metrics=True)
+    app.add_route("/hello", hello)
+    client = TestClient(app)
+    client.get("/hello")
+    response = client.get("/metrics")
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    lines = response.text.splitlines()
+    assert "# TYPE http_requests_total counter" in lines
+    assert any(
+        line.startswith('http_requests_total{route="hello",method="GET",status="200"} ')
+        for line in lines
+    )
+    assert any(
+        line.startswith('http_request_duration_seconds_count{route="hello",method="GET"} ')
+        for line in lines
+    )
@@ -0,0 +1,59 @@
+import asyncio
+
+from starlette.testclient import TestClient
+
+from shared.contrib.payment.views import create_payment_app_instance
+from shared.jobs import JobQueue, SQLiteJobStore
+
+URL = "/paystack/verify-payment/order1/?amount=100&trxref=ref1"
+
+
+class Services(object):
+    def __init__(self):
+        self.verified = 0
+        self.processed = []
+
+    async def paystack_verification(self, params):
+        self.verified += 1
+        return True, "Verification successful"
+
+    def process_paystack_payment(self, request, order, kind="paystack", data=None):
+        self.processed.append((order, request["trxref"]))
+        return order
+
+
+def test_verified_payment_is_processed_once():
+    services = Services()
+    client = TestClient(create_payment_app_instance(services=services))
+    assert client.get(URL).json() == {"success": True}
+    assert client.get(URL).json() == {"success": True}
+    assert services.verified == 1
+    assert services.processed == [("order1", "ref1")]
+
+
+def test_failed_enqueue_is_retried_by_the_next_hit(monkeypatch):
+    services = Services()
+    queue = JobQueue(SQLiteJobStore(":memory:"), name="test-payments")
+    add = queue.store.add
+    failures = [RuntimeError("database is locked")]
+
+    def flaky_add(*args):
+        if failures:
+            raise failures.pop()
+        return add(*args)
+
+    monkeypatch.setattr(queue.store, "add", flaky_add)
+    client = TestClient(
+        create_payment_app_instance(services=services, job_queue=queue),
+        raise_server_exceptions=False,
+    )
+    assert client.get(URL).status_code == 500
+    assert client.get(URL).json() == {"success": True}
+    assert client.get(URL).json() == {"success": True}
+
+    loop = asyncio.get_event_loop()
+    while loop.run_until_complete(queue.run_once()):
+        pass
+    assert services.processed == [("order1", "ref1")]
+    # verified again after the failed hit, cached once the job was stored
+    assert services.verified == 2
@@ -0,0 +1,118 @@
+import asyncio
+
+import pytest
+
+httpx = pytest.importorskip("httpx")
+
+from shared.contrib.payment.client import AsyncPaystackClient, PaystackError  # noqa: E402
+
+TRANSACTION = {
+    "status": "success",
+    "amount": 500000,
+    "customer": {"id": 1, "customer_code": "CUS_1"},
+    "authorization": {"last4": "4081"},
+    "plan": "PLN_1",
+}
+
+
+def run(coroutine):
+    return asyncio.get_event_loop().run_until_complete(coroutine)
+
+
+def make_client(*responses):
+    """A client whose transport answers with `responses` in turn."""
+    requests = []
+    answers = list(responses)
+
+    def handler(request):
+        requests.append(request)
+        status, body = answers.pop(0)
+        if isinstance(body, bytes):
+            return httpx.Response(status, content=body)
+        return httpx.Response(status, json=body)
+
+    client = AsyncPaystackClient(
+        "sk_test",
+        "https://paystack.test",
+        backoff=0,
+        transport=httpx.MockTransport(handler),
+    )
+    return client, requests
+
+
+def verified(data=TRANSACTION):
+    return 200, {"status": True, "message": "Verification successful", "data": data}
+
+
+def test_retries_5xx_and_429():
+    client, requests = make_client((502, {}), (429, {}), verified())
+    assert run(client.verify_payment("ref1", amount=500000)) == (
+        True,
+        "Verification successful",
+    )
+    assert len(requests) == 3
+    assert {request.headers["authorization"] for request in requests} == {
+        "Bearer sk_test"
+    }
+
+
+def test_gives_up_after_the_retries():
+    client, requests = make_client((500, {}), (503, {}), (500, {}))
+    with pytest.raises(PaystackError):
+        run(client.verify_payment("ref1"))
+    assert len(requests) == 3
+
+
+def test_non_json_body_raises_paystack_error():
+    client, _ = make_client((404, b"<html>Not Found</html>"))
+    with pytest.raises(PaystackError):
+        run(client.verify_payment("ref1"))
+
+
+def test_amount_mismatch():
+    client, _ = make_client(verified())
+    assert run(client.verify_payment("ref1", amount=100)) == (
+        False,
+        "Amount paid does not match",
+    )
+
+
+def test_failed_transaction():
+    client, _ = make_client(
+        (400, {"status": False, "message": "Transaction reference not found"})
+    )
+    assert run(client.verify_payment("ref1")) == (
+        False,
+        "Transaction reference not found",
+    )
+
+
+def test_payment_details():
+    client, requests = make_client(
+        verified(),
+        (200, {"status": True, "data": {"customer_code": "CUS_1", "email": "a@b.c"}}),
+        (200, {"status": True, "data": {"id": 7, "plan_code": "PLN_1"}}),
+    )
+    success, message, details = run(client.verify_payment("ref1", amount_only=False))
+    assert success is True
+    assert details == {
+        "customer": {"customer_code": "CUS_1", "email": "a@b.c"},
+        "authorization": {"last4": "4081"},
+        "plan": "PLN_1",
+        "plan_details": {"id": 7, "plan_code": "PLN_1"},
+    }
+    assert sorted(request.url.path for request in requests[1:]) == [
+        "/customer/CUS_1",
+        "/plan/PLN_1",
+    ]
+
+
+def test_references_stay_in_one_path_segment():
+    client, requests = make_client(*[(200, {"status": False})] * 3)
+    for ref in ("../plan/PLN_1", "ref?amount=1", ".."):
+        run(client.verify_payment(ref))
+    assert [request.url.raw_path for request in requests] == [
+        b"/transaction/verify/..%2Fplan%2FPLN_1",
+        b"/transaction/verify/ref%3Famount%3D1",
+        b"/transaction/verify/%2E%2E",
+    ]
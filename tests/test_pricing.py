@@ -0,0 +1,56 @@
+from decimal import Decimal
+
+import pytest
+
+from shared.contrib.payment.pricing import PricingTable
+
+CONFIG = {
+    "plans": {
+        "basic": {
+            "monthly": {"ngn": 1000, "usd": 2.5},
+            "semi_annual": {"ngn": 5000.555},
+        },
+        "pro": {"monthly": {"usd": 0.1}},
+    },
+    "discount": 10,
+    "plan_code": {"basic": {"monthly": {"ngn": "PLN_basic"}}},
+}
+
+
+def test_prices_are_decimals_rounded_to_cents():
+    table = PricingTable(CONFIG)
+    assert table.price("basic", "monthly", "usd") == Decimal("2.50")
+    assert table.price("pro", "monthly", "usd") == Decimal("0.10")
+    assert table.price("basic", "semi_annual", "ngn") == Decimal("5000.56")
+
+
+def test_annual_prices_are_derived_with_the_discount():
+    table = PricingTable(CONFIG)
+    # monthly wins over semi_annual for a currency that has both
+    assert table.price("basic", "annual", "ngn") == Decimal("10800.00")
+    assert table.price("basic", "annually", "usd") == Decimal("27.00")
+    assert table.price("pro", "annual", "usd") == Decimal("1.08")
+    assert set(table.durations("basic")) == {
+        "monthly", "semi_annual", "annual", "annually"}
+    assert list(table.durations("missing")) == []
+
+
+def test_unknown_lookups_raise_key_error():
+    table = PricingTable(CONFIG)
+    for args in (("gold", "monthly", "ngn"), ("basic", "weekly", "ngn"),
+                 ("basic", "monthly", "eur")):
+        with pytest.raises(KeyError):
+            table.price(*args)
+    assert table.plan_code("basic", "monthly", "ngn") == "PLN_basic"
+    assert table.plan_code("basic", "monthly") == {"ngn": "PLN_basic"}
+
+
+def test_tables_are_read_only_and_cached_per_config():
+    table = PricingTable.for_config(CONFIG)
+    assert PricingTable.for_config(dict(CONFIG)) is table
+    assert PricingTable.for_config(table) is table
+    assert PricingTable.for_config({**CONFIG, "discount": 20}) is not table
+    with pytest.raises(AttributeError):
+        table.discount = 0
+    with pytest.raises(TypeError):
+        table.plans["basic"]["monthly"]["ngn"] = Decimal(1)
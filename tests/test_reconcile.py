@@ -0,0 +1,118 @@
+import asyncio
+import json
+import os
+
+import pytest
+from django.db import connection, models
+
+from shared.contrib.payment.client import PaystackError
+from shared.contrib.payment.reconcile import SubscriptionReconciler
+
+
+class Record(models.Model):
+    id = models.CharField(max_length=20, primary_key=True)
+    payload = models.TextField(default="{}")
+
+    class Meta:
+        app_label = "auth"
+
+    @property
+    def extra_data(self):
+        return json.loads(self.payload)
+
+    @extra_data.setter
+    def extra_data(self, value):
+        self.payload = json.dumps(value)
+
+
+class Client(object):
+    def __init__(self, failing=()):
+        self.failing = set(failing)
+
+    async def get_plan(self, plan_code):
+        return {"id": 7}
+
+    async def get_subscriptions(self, plan, customer):
+        if customer in self.failing:
+            raise PaystackError("unavailable")
+        return [{"subscription_code": "SUB_%s" % customer, "email_token": "t"}]
+
+
+class Reconciler(SubscriptionReconciler):
+    def save_chunk(self, records):
+        if records:
+            Record.objects.bulk_update(records, ["payload"])
+
+
+@pytest.fixture
+def records():
+    with connection.schema_editor() as editor:
+        editor.create_model(Record)
+    Record.objects.bulk_create(
+        Record(
+            id=pk,
+            extra_data={"paystack_details": {"plan": "PLN", "customer": {"id": pk}}},
+        )
+        for pk in ["k3x", "a9q", "m2c", "z0b", "c7d"]
+    )
+    yield
+    with connection.schema_editor() as editor:
+        editor.delete_model(Record)
+
+
+def reconcile(checkpoint, failing=(), **kwargs):
+    reconciler = Reconciler(
+        Record.objects.all(),
+        client=Client(failing),
+        chunk_size=2,
+        rate=1000,
+        checkpoint=checkpoint,
+        progress=None,
+    )
+    return asyncio.get_event_loop().run_until_complete(reconciler.run(**kwargs))
+
+
+def subscription_codes():
+    return {
+        record.pk: record.extra_data["paystack_details"].get("subscription_code")
+        for record in Record.objects.all()
+    }
+
+
+def test_checkpoint_is_cleared_after_a_clean_run(records, tmp_path):
+    checkpoint = str(tmp_path / "checkpoint.json")
+    totals = reconcile(checkpoint)
+    assert totals["updated"] == 5
+    assert not os.path.exists(checkpoint)
+    # a second run starts over instead of finding nothing to do
+    assert reconcile(checkpoint)["processed"] == 5
+
+
+def test_failed_records_are_retried(records, tmp_path):
+    checkpoint = str(tmp_path / "checkpoint.json")
+    totals = reconcile(checkpoint, failing={"a9q", "z0b"})
+    assert (totals["updated"], totals["failed"]) == (3, 2)
+    with open(checkpoint) as state:
+        assert sorted(json.load(state)["failed"]) == ["a9q", "z0b"]
+
+    totals = reconcile(checkpoint, failing={"z0b"}, retry_failed=True)
+    assert (totals["processed"], totals["updated"], totals["failed"]) == (2, 1, 1)
+    with open(checkpoint) as state:
+        assert json.load(state)["failed"] == ["z0b"]
+
+    totals = reconcile(checkpoint, retry_failed=True)
+    assert totals["updated"] == 1
+    assert not os.path.exists(checkpoint)
+    assert all(subscription_codes().values())
+
+
+def test_interrupted_run_resumes(records, tmp_path):
+    checkpoint = str(tmp_path / "checkpoint.json")
+    with open(checkpoint, "w") as state:
+        json.dump({"last_pk": "k3x", "stats": {"processed": 3}, "failed": []}, state)
+    totals = reconcile(checkpoint)
+    assert totals["processed"] == 5
+    assert sorted(pk for pk, code in subscription_codes().items() if code) == [
+        "m2c",
+        "z0b",
+    ]
@@ -0,0 +1,68 @@
+import json
+import threading
+
+from django.contrib.contenttypes.models import ContentType
+from django.db import connection
+from starlette.testclient import TestClient
+
+from shared.executors import configure_pool, get_pool
+from shared.responses import StreamingJSONResponse
+from shared.starlette import create_asgi_app
+
+
+def serve(content, **kwargs):
+    async def app(scope, receive, send):
+        await StreamingJSONResponse(content, **kwargs)(scope, receive, send)
+
+    return TestClient(app).get("/")
+
+
+def test_streams_lists_and_generators():
+    assert serve([{"a": 1}, {"a": 2}], chunk_size=1).json() == [{"a": 1}, {"a": 2}]
+    response = serve((i for i in range(5)), ndjson=True, chunk_size=2)
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    assert response.text == "0\n1\n2\n3\n4\n"
+
+
+def test_querysets_stream_on_the_stream_pool():
+    with connection.schema_editor() as editor:
+        editor.create_model(ContentType)
+    try:
+        ContentType.objects.bulk_create(
+            ContentType(app_label="app", model="model%d" % i) for i in range(7)
+        )
+        db_calls = get_pool("db").stats["calls"]
+        stream_calls = get_pool("stream").stats["calls"]
+        response = serve(
+            ContentType.objects.order_by("id").values_list("model", flat=True),
+            chunk_size=3,
+        )
+        assert json.loads(response.text) == ["model%d" % i for i in range(7)]
+        assert get_pool("db").stats["calls"] == db_calls
+        assert get_pool("stream").stats["calls"] == stream_calls + 1
+    finally:
+        with connection.schema_editor() as editor:
+            editor.delete_model(ContentType)
+
+
+def test_saturated_stream_pool_answers_503_before_streaming():
+    release = threading.Event()
+    pool = configure_pool("stream", max_workers=1, max_queue=0)
+    app = create_asgi_app(debug=False)
+
+    @app.route("/export")
+    async def export(request):
+        return StreamingJSONResponse(i for i in range(3))
+
+    client = TestClient(app)
+    try:
+        busy = pool.submit(release.wait)
+        response = client.get("/export")
+        assert response.status_code == 503
+        assert response.json()["pool"] == "stream"
+        release.set()
+        busy.result()
+        assert client.get("/export").json() == [0, 1, 2]
+    finally:
+        release.set()
+        configure_pool("stream")
@@ -0,0 +1,72 @@
+import asyncio
+
+from shared.routing import PrefixDispatcher
+
+
+def run(coroutine):
+    return asyncio.get_event_loop().run_until_complete(coroutine)
+
+
+def lifespan_app(name, events, fail=False):
+    async def app(scope, receive, send):
+        assert scope["type"] == "lifespan"
+        await receive()
+        if fail:
+            events.append(name + " failed")
+            await send({"type": "lifespan.startup.failed", "message": name})
+            return
+        events.append(name + " started")
+        await send({"type": "lifespan.startup.complete"})
+        await receive()
+        events.append(name + " stopped")
+        await send({"type": "lifespan.shutdown.complete"})
+
+    return app
+
+
+def run_lifespan(dispatcher):
+    inbox = asyncio.Queue()
+    sent = []
+    inbox.put_nowait({"type": "lifespan.startup"})
+
+    async def send(message):
+        sent.append(message["type"])
+        if message["type"] == "lifespan.startup.complete":
+            await inbox.put({"type": "lifespan.shutdown"})
+
+    run(dispatcher({"type": "lifespan"}, inbox.get, send))
+    return sent
+
+
+def test_lifespan_shuts_down_in_reverse_order():
+    events = []
+    dispatcher = PrefixDispatcher([
+        ("/a", lifespan_app("a", events)),
+        ("/b", lifespan_app("b", events)),
+    ])
+    assert run_lifespan(dispatcher) == [
+        "lifespan.startup.complete", "lifespan.shutdown.complete"]
+    started = [event.split()[0] for event in events if event.endswith("started")]
+    stopped = [event.split()[0] for event in events if event.endswith("stopped")]
+    assert len(started) == 2
+    assert stopped == list(reversed(started))
+
+
+def test_failed_startup_shuts_down_started_mounts():
+    events = []
+    broken = lifespan_app("broken", events, fail=True)
+    dispatcher = PrefixDispatcher([
+        ("/broken", broken),
+        ("/second", lifespan_app("second", events)),
+        ("/first", lifespan_app("first", events)),
+    ])
+    # the failing mount must start after the others for this test to bite
+    assert list(dispatcher.mounted_apps())[-1] is broken
+    assert run_lifespan(dispatcher) == ["lifespan.startup.failed"]
+    assert events == [
+        "first started",
+        "second started",
+        "broken failed",
+        "second stopped",
+        "first stopped",
+    ]
@@ -0,0 +1,53 @@
+from decimal import Decimal
+
+import pytest
+
+from shared import serializers
+from shared.responses import JSONResponse
+
+PAYLOAD = {
+    "amount": Decimal("15000.00"),
+    "name": "Ọlámídé",
+    "items": [1, 2.5, None, True, {"nested": (1, "two")}],
+    1: "non-string key",
+}
+
+
+def make_serializers():
+    candidates = [serializers.JSONSerializer()]
+    if serializers.orjson is not None:
+        candidates.append(serializers.OrjsonSerializer())
+    return candidates
+
+
+@pytest.mark.parametrize("serializer", make_serializers())
+@pytest.mark.parametrize(
+    "content",
+    [
+        float("nan"),
+        {"a": float("nan")},
+        {"a": [1, None, {"b": (float("inf"),)}]},
+        [None, -float("inf")],
+    ],
+)
+def test_non_finite_floats_raise(serializer, content):
+    with pytest.raises(ValueError):
+        serializer.dumps(content)
+
+
+def test_json_response_rejects_nan():
+    with pytest.raises(ValueError):
+        JSONResponse({"a": float("nan")})
+
+
+def test_orjson_matches_stdlib():
+    pytest.importorskip("orjson")
+    expected = serializers.JSONSerializer().dumps(PAYLOAD)
+    assert serializers.OrjsonSerializer().dumps(PAYLOAD) == expected
+    assert serializers.OrjsonSerializer().dumps({"big": 2 ** 70}) == b'{"big":%d}' % 2 ** 70
+
+
+def test_orjson_lenient_nan():
+    pytest.importorskip("orjson")
+    serializer = serializers.OrjsonSerializer(strict_nan=False)
+    assert serializer.dumps({"a": float("nan")}) == b'{"a":null}'
@@ -0,0 +1,57 @@
+import asyncio
+
+from starlette.testclient import TestClient
+
+from shared.starlette import create_asgi_app
+from shared.warmup import Warmup
+
+
+def run(coroutine):
+    return asyncio.get_event_loop().run_until_complete(coroutine)
+
+
+def test_not_ready_before_startup():
+    app = create_asgi_app(warmup={"background": False})
+    response = TestClient(app).get("/ready")
+    assert response.status_code == 503
+    assert response.json()["ready"] is False
+
+
+def test_ready_after_warmup_and_failures_are_reported():
+    app = create_asgi_app(warmup={"background": False, "readiness_path": "/healthz"})
+    calls = []
+
+    def broken():
+        raise RuntimeError("no cache server")
+
+    app.state.warmup.add("sync", lambda: calls.append("sync"))
+    app.state.warmup.add("broken", broken)
+    with TestClient(app) as client:
+        response = client.get("/healthz")
+    assert response.status_code == 200
+    body = response.json()
+    assert body["ready"] is True
+    assert body["failed"] == ["broken"]
+    assert set(body["timings"]) == {"settings", "sync", "broken"}
+    assert calls == ["sync"]
+
+
+def test_background_warmup_answers_503_until_done():
+    warm = Warmup()
+    release = asyncio.Event()
+
+    async def slow():
+        await release.wait()
+
+    warm.add("slow", slow)
+
+    async def scenario():
+        await warm.startup()
+        await asyncio.sleep(0)
+        before = (await warm.readiness(None)).status_code
+        release.set()
+        await warm._task
+        after = (await warm.readiness(None)).status_code
+        return before, after
+
+    assert run(scenario()) == (503, 200)